@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+# Days of earlier spending a category's baseline is built from
+BASELINE_DAYS = 30
+
+# Spending days a category needs in its baseline before spikes are flagged
+MIN_HISTORY = 5
+
+# Standard deviations above the baseline that count as a spike
+Z_THRESHOLD = 3.0
+
+# Floor under a baseline's standard deviation, as a fraction of its mean and
+# in currency units, so steady spending such as a subscription can still spike
+MIN_STD_FRACTION = 0.1
+MIN_STD = 1.0
+
+# Same-amount charges in the same category within this many days look doubled
+DUPLICATE_DAYS = 3
+
+DUPLICATE_KEY = ['Type', 'Category', 'Cents']
+
+
+def _prepare(transactions):
+    prepared = transactions[['ID', 'Date', 'Category', 'Description', 'Amount', 'Type']].copy()
+    prepared['Date'] = pd.to_datetime(prepared['Date']).dt.normalize()
+    prepared['Cents'] = (pd.to_numeric(prepared['Amount'], errors='coerce') * 100).round()
+    return prepared.dropna(subset=['Date', 'Cents'])
+
+
+def find_spikes(prepared, baseline_days=BASELINE_DAYS, min_history=MIN_HISTORY, z_threshold=Z_THRESHOLD):
+    """Return days where a category's spending is far above its recent baseline.
+
+    Expenses are summed per category and day; each day is compared with the
+    mean and standard deviation of the category's spending days in the
+    preceding ``baseline_days`` (the day itself excluded). The standard
+    deviation is floored at ``MIN_STD_FRACTION`` of the mean or ``MIN_STD``,
+    whichever is larger, so a perfectly steady baseline can still be beaten.
+    """
+    expenses = prepared[prepared['Type'] == 'Expense']
+    daily = (
+        expenses.groupby(['Category', 'Date'])['Amount'].sum()
+        .reset_index()
+        .sort_values(['Category', 'Date'], kind='mergesort')
+    )
+    if daily.empty:
+        return pd.DataFrame(columns=['Date', 'Category', 'Amount', 'Baseline', 'Z'])
+    rolling = daily.set_index('Date').groupby('Category')['Amount'].rolling(f"{baseline_days}D", closed='left')
+    # groupby().rolling() keeps the (Category, Date) order of daily
+    daily['Baseline'] = rolling.mean().to_numpy()
+    baseline = daily['Baseline'].to_numpy()
+    std = np.fmax(rolling.std().to_numpy(), np.maximum(MIN_STD_FRACTION * baseline, MIN_STD))
+    count = rolling.count().to_numpy()
+    with np.errstate(invalid='ignore'):
+        daily['Z'] = (daily['Amount'].to_numpy() - baseline) / std
+        flagged = (count >= min_history) & (daily['Z'].to_numpy() >= z_threshold)
+    return daily[flagged].reset_index(drop=True)
+
+
+def find_duplicates(prepared, window_days=DUPLICATE_DAYS):
+    """Return transactions that repeat an earlier one within ``window_days``.
+
+    Rows are sorted by type, category, amount and date, so a repeat always
+    sits right after the transaction it repeats; one comparison with the
+    previous row replaces comparing every pair.
+    """
+    ordered = prepared.sort_values(DUPLICATE_KEY + ['Date'], kind='mergesort')
+    previous = ordered.shift()
+    same_key = (ordered[DUPLICATE_KEY] == previous[DUPLICATE_KEY]).all(axis=1)
+    close = (ordered['Date'] - previous['Date']) <= pd.Timedelta(days=window_days)
+    repeated = same_key & close
+    duplicates = ordered.loc[repeated, ['ID', 'Date', 'Category', 'Description', 'Amount']].copy()
+    duplicates['Original ID'] = previous.loc[repeated, 'ID']
+    duplicates['Original Date'] = previous.loc[repeated, 'Date']
+    return duplicates.reset_index(drop=True)
+
+
+class AnomalyScanner:
+    """Keeps spike and duplicate alerts up to date as transactions change.
+
+    Each update hashes the transactions to find rows added, changed or
+    removed since the last update, then recomputes spikes only for the
+    categories and duplicates only for the amounts those rows touch.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.spikes = find_spikes(_prepare(_empty()))
+        self.duplicates = find_duplicates(_prepare(_empty()))
+        self._hashes = pd.Series(dtype='uint64')
+        self._keys = pd.DataFrame(columns=DUPLICATE_KEY)
+
+    def update(self, transactions, version=None):
+        """Bring the alerts in line with ``transactions``"""
+        if version is not None and version == self.version:
+            return
+        self.version = version
+        prepared = _prepare(transactions).drop_duplicates('ID').set_index('ID', drop=False)
+        hashes = pd.util.hash_pandas_object(prepared[['Date', 'Category', 'Amount', 'Type']], index=False)
+        hashes.index = prepared.index
+
+        old_hashes = self._hashes.reindex(hashes.index)
+        dirty = hashes.index[old_hashes.isna() | (old_hashes != hashes)]
+        gone = self._hashes.index.difference(hashes.index)
+        changed = dirty.intersection(self._keys.index).append(gone)
+        touched = pd.concat([prepared.loc[dirty, DUPLICATE_KEY], self._keys.loc[changed]])
+
+        self._hashes = hashes
+        self._keys = prepared[DUPLICATE_KEY]
+        if touched.empty:
+            return
+
+        categories = touched['Category'].unique()
+        in_categories = prepared[prepared['Category'].isin(categories)]
+        self.spikes = pd.concat(
+            [self.spikes[~self.spikes['Category'].isin(categories)], find_spikes(in_categories)],
+            ignore_index=True,
+        ).sort_values('Date', kind='mergesort', ignore_index=True)
+
+        touched_keys = pd.MultiIndex.from_frame(touched.drop_duplicates())
+        affected = pd.MultiIndex.from_frame(prepared[DUPLICATE_KEY]).isin(touched_keys)
+        kept = self.duplicates[~self.duplicates['ID'].isin(prepared.index[affected]) & ~self.duplicates['ID'].isin(gone)]
+        self.duplicates = pd.concat(
+            [kept, find_duplicates(prepared[affected])],
+            ignore_index=True,
+        ).sort_values('Date', kind='mergesort', ignore_index=True)
+
+
+def _empty():
+    return pd.DataFrame(columns=['ID', 'Date', 'Category', 'Description', 'Amount', 'Type'])
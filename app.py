@@ -6,6 +6,20 @@ import plotly.graph_objects as go
 from datetime import datetime
 import os
 import uuid
+from contextlib import contextmanager
+from ledger_cache import LedgerCache, content_hash
+from ledger_store import StoreRegistry, LockTimeout, apply_change, ensure_ids, inverse_change, new_record_id
+from ledger_history import History
+import budget_io
+from budget_io import budget_file_path, month_from_filename, save_to_excel
+from chart_data import balance_series, spending_by_period
+from anomalies import AnomalyScanner
+import folder_sync
+from ingest_server import drain_inbox
+
+# Loaded ledgers are shared between sessions; copy-on-write keeps one
+# session's edits from leaking into the shared frames
+pd.set_option("mode.copy_on_write", True)
 
 # Set page configuration
 st.set_page_config(
@@ -96,57 +110,323 @@ if 'budget_data' not in st.session_state:
         'transactions': pd.DataFrame(columns=['Date', 'Category', 'Description', 'Amount', 'Type']),
         'month': datetime.now().strftime('%B %Y')
     }
+    ensure_ids(st.session_state.budget_data)
+    st.session_state.data_version = uuid.uuid4().hex
 
 if 'file_path' not in st.session_state:
     st.session_state.file_path = None
 
-# Helper functions
-def save_to_excel(data, file_path=None):
-    """Save budget data to Excel file"""
-    if file_path is None:
-        file_path = f"budget_{data['month'].replace(' ', '_')}.xlsx"
-    
-    with pd.ExcelWriter(file_path) as writer:
-        data['income'].to_excel(writer, sheet_name='Income', index=False)
-        data['expenses'].to_excel(writer, sheet_name='Expenses', index=False)
-        data['transactions'].to_excel(writer, sheet_name='Transactions', index=False)
-        
-        # Create summary sheet
-        summary = pd.DataFrame({
-            'Category': ['Total Income', 'Total Expenses', 'Net'],
-            'Amount': [
-                data['income']['Amount'].sum(),
-                data['expenses']['Amount'].sum(),
-                data['income']['Amount'].sum() - data['expenses']['Amount'].sum()
-            ]
-        })
-        summary.to_excel(writer, sheet_name='Summary', index=False)
-    
-    return file_path
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+    st.session_state.ledger_store = None
+    st.session_state.pending_changes = []
 
+if 'history' not in st.session_state:
+    st.session_state.history = History()
+
+if 'anomaly_scanner' not in st.session_state:
+    st.session_state.anomaly_scanner = AnomalyScanner()
+
+# Helper functions
 def load_from_excel(file_path):
     """Load budget data from Excel file"""
     try:
-        income = pd.read_excel(file_path, sheet_name='Income')
-        expenses = pd.read_excel(file_path, sheet_name='Expenses')
-        transactions = pd.read_excel(file_path, sheet_name='Transactions')
-        
-        # Convert date column to datetime if it exists
-        if 'Date' in transactions.columns:
-            transactions['Date'] = pd.to_datetime(transactions['Date']).dt.date
-        
-        month = os.path.basename(file_path).replace('budget_', '').replace('.xlsx', '').replace('_', ' ')
-        
-        return {
-            'income': income,
-            'expenses': expenses,
-            'transactions': transactions,
-            'month': month
-        }
+        return budget_io.load_from_excel(file_path)
     except Exception as e:
         st.error(f"Error loading file: {e}")
         return None
 
+@st.cache_resource
+def get_ledger_cache():
+    """Process-wide cache of loaded ledgers shared by all sessions"""
+    return LedgerCache()
+
+def load_uploaded_file(uploaded_file, uploader):
+    """Load an uploaded workbook into this session through the shared cache.
+
+    Returns True when the session's data was replaced. Re-running the script
+    with the same upload keeps the session's edits instead of reloading;
+    once the file is removed from ``uploader``, uploading it again reloads it.
+    """
+    loaded_uploads = st.session_state.setdefault('loaded_uploads', {})
+    if uploaded_file is None:
+        loaded_uploads.pop(uploader, None)
+        return False
+    file_bytes = uploaded_file.getvalue()
+    file_hash = content_hash(file_bytes)
+    if loaded_uploads.get(uploader) == file_hash:
+        return False
+    
+    def load():
+        # Save the uploaded file to a temporary location
+        temp_file = f"temp_{uuid.uuid4()}.xlsx"
+        with open(temp_file, "wb") as f:
+            f.write(file_bytes)
+        try:
+            return load_from_excel(temp_file)
+        finally:
+            # Clean up the temporary file
+            try:
+                os.remove(temp_file)
+            except:
+                pass
+    
+    loaded_data = get_ledger_cache().get_or_load(file_hash, load)
+    if not loaded_data:
+        return False
+    
+    loaded_data['month'] = month_from_filename(uploaded_file.name)
+    st.session_state.budget_data = loaded_data
+    loaded_uploads[uploader] = file_hash
+    # Sessions that load the same file share cached chart data
+    st.session_state.data_version = file_hash
+    st.session_state.history.clear()
+    return True
+
+@st.cache_resource
+def get_store_registry():
+    """Process-wide registry of the ledgers shared in multi-user mode"""
+    return StoreRegistry()
+
+def refresh_from_store(store):
+    """Replace this session's data with the shared ledger's current state"""
+    revision, data, versions = store.snapshot()
+    st.session_state.budget_data = data
+    st.session_state.ledger_revision = revision
+    st.session_state.ledger_versions = versions
+    st.session_state.pending_changes = []
+    st.session_state.data_version = uuid.uuid4().hex
+
+def join_shared_ledger():
+    """Attach this session to the shared ledger of the current month"""
+    file_path = budget_file_path(st.session_state.budget_data['month'])
+    local_data = st.session_state.budget_data
+    
+    def load():
+        if os.path.exists(file_path):
+            loaded_data = load_from_excel(file_path)
+            if loaded_data:
+                return loaded_data
+        return local_data
+    
+    st.session_state.ledger_store = get_store_registry().open(file_path, load)
+    refresh_from_store(st.session_state.ledger_store)
+    st.session_state.history.clear()
+
+def pull_shared_changes():
+    """Apply changes other sessions committed since this session last synced"""
+    store = st.session_state.ledger_store
+    result = store.changes_since(st.session_state.ledger_revision, st.session_state.session_id)
+    if result is None:
+        # Too far behind for the change log; start from a fresh snapshot and
+        # replay local edits on top so they are still committed (or rejected)
+        pending = st.session_state.pending_changes
+        refresh_from_store(store)
+        for change in pending:
+            apply_change(st.session_state.budget_data, change)
+        st.session_state.pending_changes = pending
+        return
+    
+    revision, changes = result
+    for change in changes:
+        apply_change(st.session_state.budget_data, change)
+        versions = st.session_state.ledger_versions[change['table']]
+        if change['op'] == 'delete':
+            versions.pop(change['id'], None)
+        else:
+            versions[change['id']] = change['version']
+    st.session_state.ledger_revision = revision
+    if changes:
+        st.session_state.data_version = uuid.uuid4().hex
+
+@contextmanager
+def change_group():
+    """Commit the changes made inside the block together in multi-user mode.
+
+    The shared ledger applies or rejects a group as a whole, so one user
+    action is never left half applied.
+    """
+    if st.session_state.get('change_group') is not None:
+        yield
+        return
+    st.session_state.change_group = uuid.uuid4().hex
+    try:
+        yield
+    finally:
+        st.session_state.change_group = None
+
+def record_change(change, undoable=True):
+    """Apply a change to this session's data, queueing it in multi-user mode"""
+    if undoable:
+        st.session_state.history.record(change, inverse_change(st.session_state.budget_data, change))
+    apply_change(st.session_state.budget_data, change)
+    st.session_state.data_version = uuid.uuid4().hex
+    if st.session_state.ledger_store is not None:
+        versions = st.session_state.ledger_versions[change['table']]
+        base_version = versions.get(change['id'], 0)
+        group = st.session_state.get('change_group') or uuid.uuid4().hex
+        st.session_state.pending_changes.append(dict(change, base_version=base_version, group=group))
+        if change['op'] == 'delete':
+            versions.pop(change['id'], None)
+        else:
+            versions[change['id']] = base_version + 1
+
+def undo():
+    """Revert the last edit"""
+    with change_group():
+        for change in st.session_state.history.undo():
+            record_change(change, undoable=False)
+
+def redo():
+    """Re-apply the last undone edit"""
+    with change_group():
+        for change in st.session_state.history.redo():
+            record_change(change, undoable=False)
+
+def add_record(table, values):
+    """Append a record to one of the budget tables"""
+    record_id = new_record_id()
+    record_change({'table': table, 'op': 'add', 'id': record_id, 'values': dict(values, ID=record_id)})
+
+def update_record(table, i, values):
+    """Update columns of the record in row i of a budget table"""
+    record_id = st.session_state.budget_data[table].loc[i, 'ID']
+    record_change({'table': table, 'op': 'update', 'id': record_id, 'values': values})
+
+def delete_record(table, i):
+    """Remove the record in row i of a budget table"""
+    record_id = st.session_state.budget_data[table].loc[i, 'ID']
+    record_change({'table': table, 'op': 'delete', 'id': record_id})
+
+def add_transaction(date, category, description, amount, trans_type):
+    """Record a transaction and add it to its income or expense category total"""
+    # Undo removes, and saving commits, the transaction and its effect on
+    # the totals together
+    with st.session_state.history.step(), change_group():
+        # Add to transactions
+        add_record('transactions', {
+            'Date': date,
+            'Category': category,
+            'Description': description,
+            'Amount': amount,
+            'Type': trans_type
+        })
+        
+        # Update income or expense totals
+        totals_table = 'income' if trans_type == "Income" else 'expenses'
+        totals = st.session_state.budget_data[totals_table]
+        for j in totals.index[totals['Category'] == category]:
+            update_record(totals_table, j, {'Amount': totals.loc[j, 'Amount'] + amount})
+
+def save_budget():
+    """Save the budget, committing queued changes first in multi-user mode.
+
+    Returns the saved file path and the changes rejected because another
+    session changed the same records first.
+    """
+    store = st.session_state.ledger_store
+    if store is None:
+        return save_to_excel(st.session_state.budget_data), []
+    
+    _, conflicts = store.commit(st.session_state.pending_changes, st.session_state.session_id)
+    refresh_from_store(store)
+    store.flush(save_to_excel)
+    return store.file_path, conflicts
+
+def commit_captured(store, transactions):
+    """Commit captured transactions to a shared ledger as one group.
+
+    The changes are made against the ledger's current state rather than
+    this session's, so the session's own queued edits are not committed.
+    Returns whether they were committed; they are not if another session
+    changed a category total in the meantime.
+    """
+    _, data, versions = store.snapshot()
+    changes = budget_io.add_transactions(data, transactions)
+    group = uuid.uuid4().hex
+    seen = {}
+    for change in changes:
+        key = (change['table'], change['id'])
+        change['base_version'] = seen.get(key, versions[change['table']].get(change['id'], 0))
+        change['group'] = group
+        seen[key] = change['base_version'] + 1
+    _, conflicts = store.commit(changes)
+    if conflicts:
+        return False
+    try:
+        store.flush(save_to_excel)
+    except OSError as e:
+        # Committed to the shared ledger, which writes them with its next save
+        st.sidebar.warning(f"Captured transactions not yet written to {store.file_path}: {e}")
+    return True
+
+def save_captured(transactions):
+    """Save transactions from the quick-capture inbox to the months they belong to.
+
+    Each month's transactions are committed to its shared ledger when one is
+    open, and otherwise added to its workbook on disk. The session's own
+    budget only changes when it shows the same month, and its unsaved edits
+    are never written. Returns the transactions saved; the inbox keeps the
+    rest.
+    """
+    by_month = {}
+    for transaction in transactions:
+        by_month.setdefault(transaction['Date'].strftime('%B %Y'), []).append(transaction)
+    
+    saved = []
+    for month, captured in by_month.items():
+        file_path = budget_file_path(month)
+        shown = month == st.session_state.budget_data['month']
+        store = get_store_registry().get(file_path)
+        try:
+            if store is not None:
+                if not commit_captured(store, captured):
+                    continue
+            else:
+                budget_io.append_to_workbook(file_path, captured)
+        except Exception as e:
+            st.sidebar.error(f"Could not save captured transactions to {file_path}: {e}")
+            continue
+        saved.extend(captured)
+        if shown and st.session_state.ledger_store is None:
+            with st.session_state.history.step():
+                for transaction in captured:
+                    add_transaction(
+                        transaction['Date'],
+                        transaction['Category'],
+                        transaction['Description'],
+                        transaction['Amount'],
+                        transaction['Type']
+                    )
+    # Shows what was committed to this session's shared ledger
+    if saved and st.session_state.ledger_store is not None:
+        pull_shared_changes()
+    return saved
+
+@st.cache_data(max_entries=64)
+def transaction_date_range(data_version, _transactions):
+    """Return the first and last transaction day, or None without dated transactions"""
+    dates = pd.to_datetime(_transactions['Date']).dropna()
+    if dates.empty:
+        return None
+    return dates.min().normalize(), dates.max().normalize()
+
+@st.cache_data(max_entries=64)
+def time_series_charts(data_version, start, end, _transactions):
+    """Aggregate and downsample transactions for the time charts.
+
+    Cached per data version and date range; the transactions themselves are
+    not hashed, so a cache hit costs nothing however long the ledger is.
+    """
+    spending, resolution = spending_by_period(_transactions, start, end)
+    return spending, resolution, balance_series(_transactions, start, end)
+
+def show_save_result(container, file_path, conflicts):
+    """Report the outcome of save_budget"""
+    container.success(f"Saved to {file_path}")
+    if conflicts:
+        container.warning(f"{len(conflicts)} change(s) were not saved because someone else changed the same records first")
+
 # Sidebar
 st.sidebar.title("Budget Controls")
 
@@ -158,31 +438,67 @@ if month != st.session_state.budget_data['month']:
 # File operations
 st.sidebar.header("File Operations")
 
+# Multi-user mode
+shared_mode = st.sidebar.checkbox(
+    "Shared ledger (multi-user)",
+    help="Edit this month's budget together with other sessions. Changes are merged when you save."
+)
+if shared_mode:
+    store = st.session_state.ledger_store
+    if store is None or store.file_path != budget_file_path(st.session_state.budget_data['month']):
+        join_shared_ledger()
+    else:
+        pull_shared_changes()
+elif st.session_state.ledger_store is not None:
+    st.session_state.ledger_store = None
+    st.session_state.pending_changes = []
+
+# Pick up transactions captured through the quick-capture endpoint
+try:
+    captured = drain_inbox(save_captured)
+except LockTimeout:
+    captured = []
+except OSError as e:
+    captured = []
+    st.sidebar.error(f"Could not save captured transactions: {e}")
+if captured:
+    st.sidebar.info(f"Saved {len(captured)} captured transaction(s)")
+
 # Save to Excel
 if st.sidebar.button("Save to Excel"):
-    file_path = save_to_excel(st.session_state.budget_data)
-    st.sidebar.success(f"Saved to {file_path}")
-    st.session_state.file_path = file_path
+    try:
+        file_path, conflicts = save_budget()
+        show_save_result(st.sidebar, file_path, conflicts)
+        st.session_state.file_path = file_path
+    except LockTimeout as e:
+        st.sidebar.error(f"Could not save: {e}")
 
 # Load from Excel
-uploaded_file = st.sidebar.file_uploader("Load from Excel", type="xlsx")
-if uploaded_file is not None:
-    # Save the uploaded file to a temporary location
-    temp_file = f"temp_{uuid.uuid4()}.xlsx"
-    with open(temp_file, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    
-    # Load the data
-    loaded_data = load_from_excel(temp_file)
-    if loaded_data:
-        st.session_state.budget_data = loaded_data
-        st.sidebar.success("Data loaded successfully!")
-    
-    # Clean up the temporary file
+uploaded_file = st.sidebar.file_uploader("Load from Excel", type="xlsx", disabled=shared_mode)
+if load_uploaded_file(uploaded_file, 'sidebar'):
+    st.sidebar.success("Data loaded successfully!")
+
+# Sync with other devices through a shared folder
+st.sidebar.header("Sync")
+sync_folder = st.sidebar.text_input(
+    "Sync folder",
+    key="sync_folder",
+    help="A folder your other devices can also reach, such as a USB drive or network share"
+)
+if st.sidebar.button("Sync now", disabled=shared_mode or not sync_folder):
+    file_path = budget_file_path(st.session_state.budget_data['month'])
+    shared_dir, state_path = folder_sync.sync_paths(file_path, sync_folder)
     try:
-        os.remove(temp_file)
-    except:
-        pass
+        report = folder_sync.sync(st.session_state.budget_data, shared_dir, state_path)
+        # Keep the workbook in step with the sync state
+        save_to_excel(st.session_state.budget_data, file_path)
+        st.session_state.file_path = file_path
+        st.session_state.data_version = uuid.uuid4().hex
+        st.sidebar.success(f"Sent {report['sent']} change(s), received {report['received']}")
+        if report['conflicts']:
+            st.sidebar.info(f"{report['conflicts']} entry(ies) were edited on several devices; the same version was kept everywhere")
+    except (folder_sync.SyncError, OSError) as e:
+        st.sidebar.error(f"Sync failed: {e}")
 
 # Main content
 st.title("Budget App")
@@ -213,6 +529,17 @@ if st.session_state.show_month_selector:
                 st.session_state.show_month_selector = False
                 st.rerun()
 
+# Undo and redo the last edits
+col1, col2 = st.columns(2)
+with col1:
+    if st.button("↩️ Undo", key="undo", disabled=not st.session_state.history.can_undo, use_container_width=True):
+        undo()
+        st.rerun()
+with col2:
+    if st.button("↪️ Redo", key="redo", disabled=not st.session_state.history.can_redo, use_container_width=True):
+        redo()
+        st.rerun()
+
 # Create tabs with iOS-style icons
 tab1, tab2, tab3, tab4 = st.tabs(["📊 Overview", "💵 Income", "💸 Expenses", "📝 Transactions"])
 
@@ -303,6 +630,84 @@ with tab1:
         st.plotly_chart(fig2, use_container_width=True)
     else:
         st.info("Add expenses to see your expense breakdown")
+    
+    # Spending and balance over time, aggregated server-side so only a few
+    # hundred points reach the browser however many transactions there are
+    transactions = st.session_state.budget_data['transactions']
+    date_range = transaction_date_range(st.session_state.data_version, transactions)
+    if date_range is not None:
+        st.markdown("### Over Time")
+        ranges = {"Last 30 days": 30, "Last 90 days": 90, "Last year": 365, "All time": None}
+        range_label = st.selectbox("Period", options=list(ranges), index=3, key="time_range")
+        first_day, end = date_range
+        days = ranges[range_label]
+        start = first_day if days is None else end - pd.Timedelta(days=days - 1)
+        end = end + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+        spending, resolution, balance = time_series_charts(
+            st.session_state.data_version, start, end, transactions
+        )
+        
+        fig3 = go.Figure()
+        fig3.add_trace(go.Bar(
+            x=spending['Date'],
+            y=spending['Income'],
+            name='Income',
+            marker_color='#34C759'  # iOS green
+        ))
+        fig3.add_trace(go.Bar(
+            x=spending['Date'],
+            y=spending['Expense'],
+            name='Expenses',
+            marker_color='#FF3B30'  # iOS red
+        ))
+        fig3.update_layout(
+            barmode='group',
+            xaxis_title="",
+            yaxis_title=f"{resolution} Amount ($)",
+            legend_title="",
+            height=300,
+            margin=dict(l=10, r=10, t=10, b=10),
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font=dict(family="-apple-system")
+        )
+        st.plotly_chart(fig3, use_container_width=True)
+        
+        fig4 = go.Figure()
+        fig4.add_trace(go.Scatter(
+            x=balance['Date'],
+            y=balance['Balance'],
+            mode='lines',
+            name='Balance',
+            line=dict(color='#007AFF')  # iOS blue
+        ))
+        fig4.update_layout(
+            xaxis_title="",
+            yaxis_title="Balance ($)",
+            height=300,
+            margin=dict(l=10, r=10, t=10, b=10),
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font=dict(family="-apple-system")
+        )
+        st.plotly_chart(fig4, use_container_width=True)
+    
+    # Unusual spending and likely double entries; only the categories and
+    # amounts touched since the last rerun are rescanned
+    scanner = st.session_state.anomaly_scanner
+    scanner.update(transactions, st.session_state.data_version)
+    if not scanner.spikes.empty or not scanner.duplicates.empty:
+        st.markdown("### Alerts")
+        for _, spike in scanner.spikes.tail(5).iloc[::-1].iterrows():
+            st.warning(
+                f"Unusual spending: ${spike['Amount']:,.2f} on {spike['Category']} "
+                f"on {spike['Date']:%b %d, %Y} (usually about ${spike['Baseline']:,.2f} a day)"
+            )
+        for _, duplicate in scanner.duplicates.tail(5).iloc[::-1].iterrows():
+            st.warning(
+                f"Possible duplicate: ${duplicate['Amount']:,.2f} for {duplicate['Category']} "
+                f"on {duplicate['Date']:%b %d, %Y}, same as on {duplicate['Original Date']:%b %d, %Y}"
+            )
 
 with tab2:
     st.header("Income")
@@ -325,14 +730,7 @@ with tab2:
             with col1:
                 if st.form_submit_button("Save"):
                     if category and amount > 0:
-                        new_income = pd.DataFrame({
-                            'Category': [category],
-                            'Amount': [amount]
-                        })
-                        st.session_state.budget_data['income'] = pd.concat(
-                            [st.session_state.budget_data['income'], new_income],
-                            ignore_index=True
-                        )
+                        add_record('income', {'Category': category, 'Amount': amount})
                         st.session_state.show_add_income = False
                         st.rerun()
             with col2:
@@ -360,7 +758,7 @@ with tab2:
         st.session_state.show_edit_income = False
         st.session_state.edit_income_index = None
         
-    if st.session_state.show_edit_income and st.session_state.edit_income_index is not None:
+    if st.session_state.show_edit_income and st.session_state.edit_income_index in st.session_state.budget_data['income'].index:
         i = st.session_state.edit_income_index
         with st.form("edit_income_form"):
             st.subheader("Edit Income Source")
@@ -371,8 +769,7 @@ with tab2:
             with col1:
                 if st.form_submit_button("Save"):
                     if category and amount >= 0:
-                        st.session_state.budget_data['income'].loc[i, 'Category'] = category
-                        st.session_state.budget_data['income'].loc[i, 'Amount'] = amount
+                        update_record('income', i, {'Category': category, 'Amount': amount})
                         st.session_state.show_edit_income = False
                         st.session_state.edit_income_index = None
                         st.rerun()
@@ -383,7 +780,7 @@ with tab2:
                     st.rerun()
             with col3:
                 if st.form_submit_button("Delete"):
-                    st.session_state.budget_data['income'] = st.session_state.budget_data['income'].drop(i).reset_index(drop=True)
+                    delete_record('income', i)
                     st.session_state.show_edit_income = False
                     st.session_state.edit_income_index = None
                     st.rerun()
@@ -437,14 +834,7 @@ with tab3:
             with col1:
                 if st.form_submit_button("Save"):
                     if category and amount > 0:
-                        new_expense = pd.DataFrame({
-                            'Category': [category],
-                            'Amount': [amount]
-                        })
-                        st.session_state.budget_data['expenses'] = pd.concat(
-                            [st.session_state.budget_data['expenses'], new_expense],
-                            ignore_index=True
-                        )
+                        add_record('expenses', {'Category': category, 'Amount': amount})
                         st.session_state.show_add_expense = False
                         st.rerun()
             with col2:
@@ -472,7 +862,7 @@ with tab3:
         st.session_state.show_edit_expense = False
         st.session_state.edit_expense_index = None
         
-    if st.session_state.show_edit_expense and st.session_state.edit_expense_index is not None:
+    if st.session_state.show_edit_expense and st.session_state.edit_expense_index in st.session_state.budget_data['expenses'].index:
         i = st.session_state.edit_expense_index
         with st.form("edit_expense_form"):
             st.subheader("Edit Expense")
@@ -483,8 +873,7 @@ with tab3:
             with col1:
                 if st.form_submit_button("Save"):
                     if category and amount >= 0:
-                        st.session_state.budget_data['expenses'].loc[i, 'Category'] = category
-                        st.session_state.budget_data['expenses'].loc[i, 'Amount'] = amount
+                        update_record('expenses', i, {'Category': category, 'Amount': amount})
                         st.session_state.show_edit_expense = False
                         st.session_state.edit_expense_index = None
                         st.rerun()
@@ -495,7 +884,7 @@ with tab3:
                     st.rerun()
             with col3:
                 if st.form_submit_button("Delete"):
-                    st.session_state.budget_data['expenses'] = st.session_state.budget_data['expenses'].drop(i).reset_index(drop=True)
+                    delete_record('expenses', i)
                     st.session_state.show_edit_expense = False
                     st.session_state.edit_expense_index = None
                     st.rerun()
@@ -567,29 +956,7 @@ with tab4:
             with col1:
                 if st.form_submit_button("Save"):
                     if category and amount > 0:
-                        # Add to transactions
-                        new_transaction = pd.DataFrame({
-                            'Date': [date],
-                            'Category': [category],
-                            'Description': [description],
-                            'Amount': [amount],
-                            'Type': [trans_type]
-                        })
-                        
-                        st.session_state.budget_data['transactions'] = pd.concat(
-                            [st.session_state.budget_data['transactions'], new_transaction],
-                            ignore_index=True
-                        )
-                        
-                        # Update income or expense totals
-                        if trans_type == "Income":
-                            idx = st.session_state.budget_data['income']['Category'] == category
-                            if any(idx):
-                                st.session_state.budget_data['income'].loc[idx, 'Amount'] += amount
-                        else:  # Expense
-                            idx = st.session_state.budget_data['expenses']['Category'] == category
-                            if any(idx):
-                                st.session_state.budget_data['expenses'].loc[idx, 'Amount'] += amount
+                        add_transaction(date, category, description, amount, trans_type)
                         
                         st.session_state.show_add_transaction = False
                         st.rerun()
@@ -632,7 +999,7 @@ with tab4:
         st.session_state.show_edit_transaction = False
         st.session_state.edit_transaction_index = None
         
-    if st.session_state.show_edit_transaction and st.session_state.edit_transaction_index is not None:
+    if st.session_state.show_edit_transaction and st.session_state.edit_transaction_index in st.session_state.budget_data['transactions'].index:
         i = st.session_state.edit_transaction_index
         with st.form("edit_transaction_form"):
             st.subheader("Edit Transaction")
@@ -663,11 +1030,13 @@ with tab4:
                 if st.form_submit_button("Save"):
                     if category and amount > 0:
                         # Update transaction
-                        st.session_state.budget_data['transactions'].loc[i, 'Date'] = date
-                        st.session_state.budget_data['transactions'].loc[i, 'Category'] = category
-                        st.session_state.budget_data['transactions'].loc[i, 'Description'] = description
-                        st.session_state.budget_data['transactions'].loc[i, 'Amount'] = amount
-                        st.session_state.budget_data['transactions'].loc[i, 'Type'] = trans_type
+                        update_record('transactions', i, {
+                            'Date': date,
+                            'Category': category,
+                            'Description': description,
+                            'Amount': amount,
+                            'Type': trans_type
+                        })
                         
                         st.session_state.show_edit_transaction = False
                         st.session_state.edit_transaction_index = None
@@ -679,7 +1048,7 @@ with tab4:
                     st.rerun()
             with col3:
                 if st.form_submit_button("Delete"):
-                    st.session_state.budget_data['transactions'] = st.session_state.budget_data['transactions'].drop(i).reset_index(drop=True)
+                    delete_record('transactions', i)
                     st.session_state.show_edit_transaction = False
                     st.session_state.edit_transaction_index = None
                     st.rerun()
@@ -693,30 +1062,18 @@ col1, col2 = st.columns(2)
 with col1:
     # Save to Excel
     if st.button("Save to Excel", key="save_excel"):
-        file_path = save_to_excel(st.session_state.budget_data)
-        st.success(f"Saved to {file_path}")
-        st.session_state.file_path = file_path
+        try:
+            file_path, conflicts = save_budget()
+            show_save_result(st, file_path, conflicts)
+            st.session_state.file_path = file_path
+        except LockTimeout as e:
+            st.error(f"Could not save: {e}")
 
 with col2:
     # Load from Excel
-    uploaded_file = st.file_uploader("Load from Excel", type="xlsx")
-    if uploaded_file is not None:
-        # Save the uploaded file to a temporary location
-        temp_file = f"temp_{uuid.uuid4()}.xlsx"
-        with open(temp_file, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        
-        # Load the data
-        loaded_data = load_from_excel(temp_file)
-        if loaded_data:
-            st.session_state.budget_data = loaded_data
-            st.success("Data loaded successfully!")
-        
-        # Clean up the temporary file
-        try:
-            os.remove(temp_file)
-        except:
-            pass
+    uploaded_file = st.file_uploader("Load from Excel", type="xlsx", key="load_excel", disabled=shared_mode)
+    if load_uploaded_file(uploaded_file, 'load_excel'):
+        st.success("Data loaded successfully!")
 
 # Footer
 st.markdown("---")
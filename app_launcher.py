@@ -1,27 +1,27 @@
 
 import os
-import subprocess
 import sys
-import time
 import webbrowser
 from threading import Timer
+from ingest_server import start_ingest_server
 
 def open_browser():
     webbrowser.open("http://localhost:8501")
 
 if __name__ == "__main__":
-    # Start Streamlit in a separate process
-    streamlit_cmd = [sys.executable, "-m", "streamlit", "run", "app.py", "--server.headless=true"]
+    # Accept quick-capture transactions while the app is running
+    try:
+        start_ingest_server()
+    except (OSError, ValueError) as e:
+        print(f"Quick-capture endpoint not started: {e}")
     
     # Open browser after a short delay
-    Timer(2, open_browser).start()
-    
-    # Run Streamlit
-    process = subprocess.Popen(streamlit_cmd)
+    if not os.environ.get("BUDGET_NO_BROWSER"):
+        Timer(2, open_browser).start()
     
-    try:
-        # Keep the app running until user closes it
-        process.wait()
-    except KeyboardInterrupt:
-        process.terminate()
-        process.wait()
+    # Run Streamlit in this process. In the standalone app sys.executable is
+    # this launcher, so "python -m streamlit" would only start another launcher
+    from streamlit.web import cli as stcli
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    sys.argv = ["streamlit", "run", app_path, "--server.headless=true", "--global.developmentMode=false"]
+    sys.exit(stcli.main())
@@ -1,8 +1,50 @@
 
 # -*- mode: python ; coding: utf-8 -*-
+import json
+import os
+import sys
+
+from PyInstaller.utils.hooks import collect_data_files, copy_metadata
 
 block_cipher = None
 
+# Modules app.py imports from next to itself
+APP_MODULES = [
+    'ledger_cache',
+    'ledger_store',
+    'ledger_history',
+    'budget_io',
+    'chart_data',
+    'anomalies',
+    'folder_sync',
+    'ingest_server',
+]
+
+# Set by "package_app.py --slim" to a trace of the modules and files the app used
+SLIM_TRACE = os.environ.get('BUDGET_SLIM_TRACE')
+
+# Packages whose direct submodules are left out of slim builds unless the app imported them
+PRUNED_PACKAGES = ['streamlit', 'plotly', 'plotly.graph_objs', 'plotly.validators', 'pyarrow']
+
+# Packages whose data files are left out of slim builds unless the app read them
+PRUNED_DATA = ['plotly', 'pyarrow']
+
+# Shared libraries only loaded by one optional module
+OPTIONAL_LIBRARIES = {
+    'arrow_flight': 'pyarrow._flight',
+    'arrow_python_flight': 'pyarrow._flight',
+    'arrow_substrait': 'pyarrow._substrait',
+    'gandiva': 'pyarrow.gandiva',
+}
+
+if SLIM_TRACE:
+    # Precompile the app's own modules into the archive
+    datas = []
+    hiddenimports = APP_MODULES
+else:
+    datas = [(f'{module}.py', '.') for module in APP_MODULES]
+    hiddenimports = []
+
 a = Analysis(
     ['app_launcher.py'],
     pathex=[],
@@ -10,16 +52,18 @@ a = Analysis(
     datas=[
         ('app.py', '.'),
         ('.streamlit', '.streamlit'),
-    ],
+    ] + datas + collect_data_files('streamlit') + copy_metadata('streamlit'),
     hiddenimports=[
         'streamlit',
+        # Imported by the code Streamlit adds to app.py when it runs it
+        'streamlit.runtime.scriptrunner.magic_funcs',
         'pandas',
         'numpy',
         'plotly',
         'openpyxl',
         'uuid',
         'datetime',
-    ],
+    ] + hiddenimports,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -30,6 +74,56 @@ a = Analysis(
     noarchive=False,
 )
 
+if SLIM_TRACE:
+    with open(SLIM_TRACE) as f:
+        trace = json.load(f)
+    used_modules = set(trace['modules'])
+    used_files = {os.path.normcase(os.path.realpath(path)) for path in trace['files']}
+    used_packages = {module.split('.')[0] for module in used_modules}
+    third_party = {
+        name.split('.')[0] for name, path, typecode in a.pure
+        if name.split('.')[0] not in sys.stdlib_module_names and not name.startswith(('pyi', '_pyi'))
+    }
+    unused_packages = third_party - used_packages
+
+    def is_used(module):
+        parts = module.split('.')
+        if parts[0] in unused_packages:
+            return False
+        for depth in range(1, len(parts)):
+            if '.'.join(parts[:depth]) in PRUNED_PACKAGES and '.'.join(parts[:depth + 1]) not in used_modules:
+                return False
+        return True
+
+    def is_used_binary(dest, typecode):
+        parts = os.path.normpath(dest).split(os.sep)
+        if typecode == 'EXTENSION' and parts[0] in third_party:
+            return is_used('.'.join(parts[:-1] + [parts[-1].split('.')[0]]))
+        return not any(
+            library in parts[-1] and not is_used(module)
+            for library, module in OPTIONAL_LIBRARIES.items()
+        )
+
+    def is_used_data(dest, source):
+        top = os.path.normpath(dest).split(os.sep)[0]
+        if top in unused_packages:
+            return False
+        return top not in PRUNED_DATA or os.path.normcase(os.path.realpath(source)) in used_files
+
+    a.pure = [entry for entry in a.pure if is_used(entry[0])]
+    a.binaries = [entry for entry in a.binaries if is_used_binary(entry[0], entry[2])]
+    a.datas = [entry for entry in a.datas if is_used_data(entry[0], entry[1])]
+
+    # Drop links to files that are no longer collected
+    collected = {os.path.normpath(entry[0]) for entry in a.binaries + a.datas if entry[2] != 'SYMLINK'}
+
+    def is_linked(entry):
+        target = os.path.normpath(os.path.join(os.path.dirname(entry[0]), entry[1]))
+        return entry[2] != 'SYMLINK' or target in collected
+
+    a.binaries = [entry for entry in a.binaries if is_linked(entry)]
+    a.datas = [entry for entry in a.datas if is_linked(entry)]
+
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
 exe = EXE(
@@ -41,7 +135,8 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    # Compressed binaries have to be unpacked on every start
+    upx=not SLIM_TRACE,
     console=True,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -56,7 +151,7 @@ coll = COLLECT(
     a.zipfiles,
     a.datas,
     strip=False,
-    upx=True,
+    upx=not SLIM_TRACE,
     upx_exclude=[],
     name='BudgetApp',
 )
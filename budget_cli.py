@@ -0,0 +1,381 @@
+"""Command-line tools for batches of budget workbooks.
+
+Examples:
+    python budget_cli.py summarize budgets/
+    python budget_cli.py merge budgets/ -o budget_2024.xlsx --month "2024"
+    python budget_cli.py convert budgets/ --to csv --out-dir exported/
+    python budget_cli.py validate budgets/ budget_March_2024.xlsx
+    python budget_cli.py bench-export --rows 100000
+    python budget_cli.py sync budget_March_2024.xlsx /mnt/shared/budgets
+
+Directories are expanded to the budget_*.xlsx files they contain. Work on
+the individual workbooks is spread over a process pool and results are
+printed as each workbook finishes.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import folder_sync
+from budget_io import SHEETS, empty_budget, load_from_excel, month_from_filename, save_to_excel, summarize
+
+# Columns each budget sheet must have
+REQUIRED_COLUMNS = {
+    'income': ['Category', 'Amount'],
+    'expenses': ['Category', 'Amount'],
+    'transactions': ['Date', 'Category', 'Description', 'Amount', 'Type'],
+}
+
+SUMMARY_FIELDS = ['file', 'month', 'income', 'expenses', 'net', 'transactions', 'error']
+
+
+def expand_paths(paths):
+    """Expand directories to the budget workbooks inside them"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, 'budget_*.xlsx'))))
+        else:
+            files.append(path)
+    return files
+
+
+def run_parallel(func, items, jobs):
+    """Yield func(item) for each item in order, using a process pool when jobs > 1"""
+    if jobs <= 1 or len(items) <= 1:
+        for item in items:
+            yield func(item)
+        return
+    chunksize = max(1, len(items) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(func, items, chunksize=chunksize)
+
+
+def summarize_file(file_path):
+    """Return the totals of one workbook"""
+    try:
+        data = load_from_excel(file_path)
+    except Exception as e:
+        return {'file': file_path, 'error': str(e)}
+    summary = summarize(data)['Amount'].tolist()
+    return {
+        'file': file_path,
+        'month': data['month'],
+        'income': float(summary[0]),
+        'expenses': float(summary[1]),
+        'net': float(summary[2]),
+        'transactions': len(data['transactions']),
+        'error': '',
+    }
+
+
+def validate_file(file_path):
+    """Return the problems found in one workbook"""
+    try:
+        data = load_from_excel(file_path)
+    except Exception as e:
+        return file_path, [f"cannot be read: {e}"]
+
+    problems = []
+    for key, columns in REQUIRED_COLUMNS.items():
+        df = data[key]
+        sheet_name = SHEETS[key]
+        missing = [column for column in columns if column not in df.columns]
+        if missing:
+            problems.append(f"{sheet_name}: missing columns {', '.join(missing)}")
+            continue
+        amounts = pd.to_numeric(df['Amount'], errors='coerce')
+        if amounts.isna().any():
+            problems.append(f"{sheet_name}: {amounts.isna().sum()} non-numeric amount(s)")
+        if (amounts < 0).any():
+            problems.append(f"{sheet_name}: {(amounts < 0).sum()} negative amount(s)")
+        if df['Category'].isna().any():
+            problems.append(f"{sheet_name}: {df['Category'].isna().sum()} row(s) without a category")
+
+    transactions = data['transactions']
+    if not any(problem.startswith('Transactions: missing') for problem in problems):
+        bad_types = ~transactions['Type'].isin(['Income', 'Expense'])
+        if bad_types.any():
+            problems.append(f"Transactions: {bad_types.sum()} row(s) with a type other than Income/Expense")
+        known = {
+            'Income': set(data['income'].get('Category', [])),
+            'Expense': set(data['expenses'].get('Category', [])),
+        }
+        unknown = [
+            category
+            for category, trans_type in zip(transactions['Category'], transactions['Type'])
+            if trans_type in known and category not in known[trans_type]
+        ]
+        if unknown:
+            problems.append(f"Transactions: {len(unknown)} row(s) with unknown categories ({', '.join(sorted(set(map(str, unknown))))})")
+    return file_path, problems
+
+
+def convert_file(args):
+    """Write one workbook as CSV files (one per sheet) or a single JSON file"""
+    file_path, fmt, out_dir = args
+    try:
+        data = load_from_excel(file_path)
+    except Exception as e:
+        return file_path, [], str(e)
+
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    written = []
+    if fmt == 'csv':
+        for key, sheet_name in SHEETS.items():
+            out_path = os.path.join(out_dir, f"{name}_{sheet_name}.csv")
+            data[key].to_csv(out_path, index=False)
+            written.append(out_path)
+    else:
+        out_path = os.path.join(out_dir, f"{name}.json")
+        document = {'month': data['month']}
+        for key in SHEETS:
+            document[key] = json.loads(data[key].to_json(orient='records', date_format='iso'))
+        with open(out_path, 'w') as f:
+            json.dump(document, f, indent=2)
+        written.append(out_path)
+    return file_path, written, ''
+
+
+def load_for_merge(file_path):
+    """Load one workbook, pre-aggregating what merge needs"""
+    try:
+        data = load_from_excel(file_path)
+    except Exception as e:
+        return file_path, None, str(e)
+    return file_path, {
+        'income': data['income'].groupby('Category', sort=False)['Amount'].sum(),
+        'expenses': data['expenses'].groupby('Category', sort=False)['Amount'].sum(),
+        'transactions': data['transactions'],
+    }, ''
+
+
+def make_bench_data(rows):
+    """Return budget data with a synthetic Transactions sheet of the given size"""
+    rng = np.random.default_rng(0)
+    categories = np.array(['Housing', 'Utilities', 'Groceries', 'Transportation', 'Health'])
+    return {
+        'income': pd.DataFrame({'Category': ['Salary'], 'Amount': [5000.0]}),
+        'expenses': pd.DataFrame({'Category': categories, 'Amount': 100.0}),
+        'transactions': pd.DataFrame({
+            'Date': pd.date_range('2000-01-01', periods=rows, freq='h').date,
+            'Category': rng.choice(categories, rows),
+            'Description': [f"Purchase {i}" for i in range(rows)],
+            'Amount': rng.random(rows).round(2) * 100,
+            'Type': 'Expense',
+        }),
+        'month': 'Benchmark',
+    }
+
+
+def pandas_export(data, file_path):
+    """Write budget data the way save_to_excel did before streaming export"""
+    with pd.ExcelWriter(file_path) as writer:
+        for key, sheet_name in SHEETS.items():
+            data[key].to_excel(writer, sheet_name=sheet_name, index=False)
+        summarize(data).to_excel(writer, sheet_name='Summary', index=False)
+
+
+def measure(func):
+    """Return the wall time and the peak traced Python memory of func()"""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def cmd_bench_export(args):
+    data = make_bench_data(args.rows)
+    frame_mb = data['transactions'].memory_usage(deep=True).sum() / 1e6
+    print(f"Transactions: {args.rows} rows, {frame_mb:.1f} MB in memory")
+    print(f"{'Method':<20} {'Seconds':>8} {'Rows/s':>10} {'Peak MB':>8} {'File MB':>8}")
+    with tempfile.TemporaryDirectory() as out_dir:
+        file_path = os.path.join(out_dir, 'bench.xlsx')
+        methods = [
+            ('pandas ExcelWriter', lambda: pandas_export(data, file_path)),
+            ('streaming', lambda: save_to_excel(data, file_path, skip_unchanged=False)),
+            ('unchanged re-save', lambda: save_to_excel(data, file_path)),
+        ]
+        for name, func in methods:
+            elapsed, peak = measure(func)
+            file_mb = os.path.getsize(file_path) / 1e6
+            print(f"{name:<20} {elapsed:>8.2f} {args.rows / elapsed:>10.0f} {peak / 1e6:>8.1f} {file_mb:>8.1f}")
+            sys.stdout.flush()
+    return 0
+
+
+def cmd_sync(args):
+    if os.path.exists(args.workbook):
+        data = load_from_excel(args.workbook)
+    else:
+        # A new device starts empty and receives everything from the folder
+        data = empty_budget(month_from_filename(args.workbook))
+    shared_dir, state_path = folder_sync.sync_paths(args.workbook, args.folder)
+    report = folder_sync.sync(data, shared_dir, state_path)
+    if report['sent'] or report['received']:
+        # Keep the workbook in step with the sync state, including new record IDs
+        save_to_excel(data, args.workbook)
+    print(f"Sent {report['sent']} record(s), received {report['received']}, resolved {report['conflicts']} conflict(s)")
+    return 0
+
+
+def cmd_summarize(args):
+    files = expand_paths(args.paths)
+    writer = None
+    if args.format == 'csv':
+        writer = csv.DictWriter(sys.stdout, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+    elif args.format == 'text':
+        print(f"{'Month':<20} {'Income':>12} {'Expenses':>12} {'Net':>12} {'Transactions':>12}")
+
+    totals = {'income': 0.0, 'expenses': 0.0, 'net': 0.0, 'transactions': 0}
+    failed = 0
+    for row in run_parallel(summarize_file, files, args.jobs):
+        if row['error']:
+            failed += 1
+            print(f"{row['file']}: {row['error']}", file=sys.stderr)
+        else:
+            for key in totals:
+                totals[key] += row[key]
+        if writer is not None:
+            writer.writerow(row)
+        elif args.format == 'json':
+            print(json.dumps(row))
+        elif not row['error']:
+            print(f"{row['month']:<20} {row['income']:>12.2f} {row['expenses']:>12.2f} {row['net']:>12.2f} {row['transactions']:>12}")
+        sys.stdout.flush()
+
+    if args.format == 'text':
+        print(f"{'Total':<20} {totals['income']:>12.2f} {totals['expenses']:>12.2f} {totals['net']:>12.2f} {totals['transactions']:>12}")
+    return 1 if failed else 0
+
+
+def cmd_merge(args):
+    files = expand_paths(args.paths)
+    income = []
+    expenses = []
+    transactions = []
+    failed = 0
+    for file_path, part, error in run_parallel(load_for_merge, files, args.jobs):
+        if error:
+            failed += 1
+            print(f"{file_path}: {error}", file=sys.stderr)
+            continue
+        income.append(part['income'])
+        expenses.append(part['expenses'])
+        transactions.append(part['transactions'])
+        print(f"Read {file_path}", file=sys.stderr)
+
+    if not files:
+        print("No workbooks to merge", file=sys.stderr)
+        return 1
+    if failed:
+        # A merge missing some months would look complete, so write nothing
+        print(f"Not merging: {failed} workbook(s) could not be read", file=sys.stderr)
+        return 1
+
+    def combine(parts):
+        return pd.concat(parts).groupby(level=0, sort=False).sum().rename_axis('Category').reset_index()
+
+    merged = {
+        'income': combine(income),
+        'expenses': combine(expenses),
+        'transactions': pd.concat(transactions, ignore_index=True),
+        'month': args.month,
+    }
+    out_path = save_to_excel(merged, args.output)
+    print(f"Merged {len(files)} workbook(s) into {out_path}")
+    return 0
+
+
+def cmd_convert(args):
+    files = expand_paths(args.paths)
+    os.makedirs(args.out_dir, exist_ok=True)
+    failed = 0
+    jobs = [(file_path, args.to, args.out_dir) for file_path in files]
+    for file_path, written, error in run_parallel(convert_file, jobs, args.jobs):
+        if error:
+            failed += 1
+            print(f"{file_path}: {error}", file=sys.stderr)
+        for out_path in written:
+            print(out_path)
+        sys.stdout.flush()
+    return 1 if failed else 0
+
+
+def cmd_validate(args):
+    files = expand_paths(args.paths)
+    invalid = 0
+    for file_path, problems in run_parallel(validate_file, files, args.jobs):
+        if problems:
+            invalid += 1
+            for problem in problems:
+                print(f"{file_path}: {problem}")
+        elif args.verbose:
+            print(f"{file_path}: OK")
+        sys.stdout.flush()
+    print(f"{len(files) - invalid} of {len(files)} workbook(s) valid", file=sys.stderr)
+    return 1 if invalid else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Batch tools for budget workbooks")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: one per CPU)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    summarize_parser = subparsers.add_parser('summarize', help="print the totals of each workbook")
+    summarize_parser.add_argument('paths', nargs='+', help="workbooks or directories")
+    summarize_parser.add_argument('--format', choices=['text', 'csv', 'json'], default='text')
+    summarize_parser.set_defaults(func=cmd_summarize)
+
+    merge_parser = subparsers.add_parser('merge', help="combine workbooks into one")
+    merge_parser.add_argument('paths', nargs='+', help="workbooks or directories")
+    merge_parser.add_argument('-o', '--output', help="output workbook (default: budget_<month>.xlsx)")
+    merge_parser.add_argument('--month', default='Merged', help="month label of the merged budget")
+    merge_parser.set_defaults(func=cmd_merge)
+
+    convert_parser = subparsers.add_parser('convert', help="export workbooks to CSV or JSON")
+    convert_parser.add_argument('paths', nargs='+', help="workbooks or directories")
+    convert_parser.add_argument('--to', choices=['csv', 'json'], default='csv')
+    convert_parser.add_argument('--out-dir', default='.', help="directory for the exported files")
+    convert_parser.set_defaults(func=cmd_convert)
+
+    validate_parser = subparsers.add_parser('validate', help="check workbooks for problems")
+    validate_parser.add_argument('paths', nargs='+', help="workbooks or directories")
+    validate_parser.add_argument('-v', '--verbose', action='store_true', help="also list valid workbooks")
+    validate_parser.set_defaults(func=cmd_validate)
+
+    bench_parser = subparsers.add_parser('bench-export', help="measure Excel export speed and memory")
+    bench_parser.add_argument('--rows', type=int, default=100000, help="number of transactions to export")
+    bench_parser.set_defaults(func=cmd_bench_export)
+
+    sync_parser = subparsers.add_parser('sync', help="exchange changes with other devices through a shared folder")
+    sync_parser.add_argument('workbook', help="budget workbook on this device")
+    sync_parser.add_argument('folder', help="folder shared between devices")
+    sync_parser.set_defaults(func=cmd_sync)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import hashlib
+import os
+
+import pandas as pd
+from openpyxl import Workbook
+
+from ledger_store import FileLock, apply_change, ensure_ids, new_record_id
+
+# Sheets holding the budget tables, in workbook order
+SHEETS = {'income': 'Income', 'expenses': 'Expenses', 'transactions': 'Transactions'}
+
+# Rows converted to cell values at a time when streaming a sheet
+EXPORT_CHUNK_ROWS = 10000
+
+# Content fingerprint and file stat of each workbook written by this process
+_written = {}
+
+
+def budget_file_path(month):
+    """Return the default workbook path for a budget month"""
+    return f"budget_{month.replace(' ', '_')}.xlsx"
+
+
+def month_from_filename(file_path):
+    """Derive the budget month from a budget_<Month>_<Year>.xlsx file name"""
+    return os.path.basename(file_path).replace('budget_', '').replace('.xlsx', '').replace('_', ' ')
+
+
+def empty_budget(month):
+    """Return budget data with no records"""
+    return ensure_ids({
+        'income': pd.DataFrame(columns=['Category', 'Amount']),
+        'expenses': pd.DataFrame(columns=['Category', 'Amount']),
+        'transactions': pd.DataFrame(columns=['Date', 'Category', 'Description', 'Amount', 'Type']),
+        'month': month
+    })
+
+
+def summarize(data):
+    """Return the Summary sheet rows for budget data"""
+    total_income = data['income']['Amount'].sum()
+    total_expenses = data['expenses']['Amount'].sum()
+    return pd.DataFrame({
+        'Category': ['Total Income', 'Total Expenses', 'Net'],
+        'Amount': [total_income, total_expenses, total_income - total_expenses]
+    })
+
+
+def frame_fingerprint(df):
+    """Return a hash of a DataFrame's columns and values"""
+    digest = hashlib.sha1(repr(list(df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def iter_rows(df):
+    """Yield the header and rows of a DataFrame as Excel cell values.
+
+    Rows are converted a chunk at a time so memory does not grow with the
+    size of the sheet. Missing values become empty cells.
+    """
+    yield list(df.columns)
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        chunk = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+        columns = [
+            chunk[column].astype(object).where(chunk[column].notna(), None).tolist()
+            for column in chunk.columns
+        ]
+        yield from zip(*columns)
+
+
+def _file_stat(file_path):
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def save_to_excel(data, file_path=None, skip_unchanged=True):
+    """Save budget data to Excel file.
+
+    Sheets are streamed row by row into a write-only workbook, so memory use
+    stays flat however long the Transactions sheet is. With
+    ``skip_unchanged`` the write is skipped when this process already wrote
+    the same content to the file and the file has not changed since.
+    """
+    if file_path is None:
+        file_path = budget_file_path(data['month'])
+    
+    sheets = {sheet_name: data[key] for key, sheet_name in SHEETS.items()}
+    # Create summary sheet
+    sheets['Summary'] = summarize(data)
+    
+    fingerprint = [frame_fingerprint(df) for df in sheets.values()]
+    key = os.path.abspath(file_path)
+    if skip_unchanged and _written.get(key) == (fingerprint, _file_stat(file_path)):
+        return file_path
+    
+    workbook = Workbook(write_only=True)
+    for sheet_name, df in sheets.items():
+        worksheet = workbook.create_sheet(sheet_name)
+        for row in iter_rows(df):
+            worksheet.append(row)
+    workbook.save(file_path)
+    
+    _written[key] = (fingerprint, _file_stat(file_path))
+    return file_path
+
+
+def load_from_excel(file_path):
+    """Load budget data from Excel file.
+
+    Raises on unreadable files or missing sheets; callers decide how to
+    report the error.
+    """
+    # Read all budget sheets with a single pass over the workbook
+    sheets = pd.read_excel(file_path, sheet_name=list(SHEETS.values()))
+    data = {key: sheets[sheet_name] for key, sheet_name in SHEETS.items()}
+    
+    # Convert date column to datetime if it exists
+    transactions = data['transactions']
+    if 'Date' in transactions.columns:
+        transactions['Date'] = pd.to_datetime(transactions['Date']).dt.date
+    
+    data['month'] = month_from_filename(file_path)
+    return ensure_ids(data)
+
+
+def add_transactions(data, transactions):
+    """Add transactions to budget data and to their income or expense category totals.
+
+    Returns the record changes made, in order.
+    """
+    changes = []
+    for transaction in transactions:
+        record_id = new_record_id()
+        change = {'table': 'transactions', 'op': 'add', 'id': record_id, 'values': dict(transaction, ID=record_id)}
+        apply_change(data, change)
+        changes.append(change)
+        totals_table = 'income' if transaction['Type'] == 'Income' else 'expenses'
+        totals = data[totals_table]
+        for j in totals.index[totals['Category'] == transaction['Category']]:
+            change = {'table': totals_table, 'op': 'update', 'id': totals.loc[j, 'ID'],
+                      'values': {'Amount': totals.loc[j, 'Amount'] + transaction['Amount']}}
+            apply_change(data, change)
+            changes.append(change)
+    return changes
+
+
+def append_to_workbook(file_path, transactions):
+    """Add transactions to the budget saved at ``file_path``.
+
+    The workbook is read, extended and written back under its file lock, so
+    nothing else saved in it is lost; a missing workbook is created with
+    only these transactions.
+    """
+    with FileLock(file_path + '.lock'):
+        if os.path.exists(file_path):
+            data = load_from_excel(file_path)
+        else:
+            data = empty_budget(month_from_filename(file_path))
+        add_transactions(data, transactions)
+        root, ext = os.path.splitext(file_path)
+        temp_path = f"{root}.saving{ext}"
+        save_to_excel(data, temp_path, skip_unchanged=False)
+        os.replace(temp_path, file_path)
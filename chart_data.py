@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+# Most points sent to the browser for a line chart
+MAX_LINE_POINTS = 500
+
+# Bar chart bucket sizes, finest first, with the longest date range each is used for
+RESOLUTIONS = [
+    (pd.Timedelta(days=92), 'D', 'Daily'),
+    (pd.Timedelta(days=730), 'W', 'Weekly'),
+    (None, 'MS', 'Monthly'),
+]
+
+
+def choose_resolution(start, end):
+    """Return the pandas frequency and label for bars over a date range"""
+    span = pd.Timestamp(end) - pd.Timestamp(start)
+    for longest, freq, label in RESOLUTIONS:
+        if longest is None or span <= longest:
+            return freq, label
+
+
+def lttb(x, y, threshold):
+    """Return the indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last point and, for every bucket in between, the
+    point forming the largest triangle with the previously kept point and
+    the average of the next bucket. This preserves the visual shape of a
+    line with far fewer points.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    kept = np.empty(threshold, dtype=int)
+    kept[0] = 0
+    kept[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        next_hi = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[hi:next_hi].mean()
+        next_y = y[hi:next_hi].mean()
+        areas = np.abs(
+            (x[previous] - next_x) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (next_y - y[previous])
+        )
+        previous = lo + int(areas.argmax())
+        kept[bucket + 1] = previous
+    return kept
+
+
+def _dated(transactions):
+    dated = transactions[['Date', 'Type', 'Amount']].copy()
+    dated['Date'] = pd.to_datetime(dated['Date'])
+    return dated.dropna(subset=['Date'])
+
+
+def spending_by_period(transactions, start, end):
+    """Return income and expense totals per bucket between start and end.
+
+    The bucket size follows the length of the range, so a chart never has
+    more than about a hundred bars.
+    """
+    freq, label = choose_resolution(start, end)
+    dated = _dated(transactions)
+    dated = dated[(dated['Date'] >= pd.Timestamp(start)) & (dated['Date'] <= pd.Timestamp(end))]
+    totals = (
+        dated.groupby([pd.Grouper(key='Date', freq=freq), 'Type'])['Amount'].sum()
+        .unstack(fill_value=0.0)
+        .reindex(columns=['Income', 'Expense'], fill_value=0.0)
+        .rename_axis(columns=None)
+        .reset_index()
+    )
+    return totals, label
+
+
+def balance_series(transactions, start, end, max_points=MAX_LINE_POINTS):
+    """Return the running balance between start and end, downsampled with LTTB.
+
+    The balance counts every transaction since the first one, so the line
+    starts at the right level however the range is cut.
+    """
+    dated = _dated(transactions)
+    signed = dated['Amount'].where(dated['Type'] == 'Income', -dated['Amount'])
+    daily = signed.groupby(dated['Date'].dt.normalize()).sum().cumsum()
+    daily = daily[(daily.index >= pd.Timestamp(start)) & (daily.index <= pd.Timestamp(end))]
+    kept = lttb(daily.index.asi8, daily.to_numpy(), max_points)
+    return pd.DataFrame({'Date': daily.index[kept], 'Balance': daily.to_numpy()[kept]})
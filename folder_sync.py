@@ -0,0 +1,267 @@
+"""Offline sync of budget ledgers through a shared folder.
+
+Each device keeps a small state file next to its workbook with a vector
+clock and content hash for every record it knows about. Syncing writes the
+records that changed locally as a numbered change-set into the shared
+folder and applies the change-sets other devices wrote since the last sync:
+
+    <folder>/<ledger>/changes/<device>/<seq>.json   record keys, clocks, chunk hashes
+    <folder>/<ledger>/chunks/<hash>.json            record contents, stored once
+
+Record contents are content-addressed, so a record that is already in the
+folder is never written again. Concurrent edits of the same record are
+resolved the same way on every device, so all devices converge.
+"""
+import datetime
+import hashlib
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from ledger_store import TABLES, apply_change
+
+
+class SyncError(Exception):
+    """Raised when a ledger cannot be synced safely"""
+
+
+def sync_paths(workbook_path, folder):
+    """Return the shared directory and local state file for syncing a workbook"""
+    name = os.path.splitext(os.path.basename(workbook_path))[0]
+    state_path = os.path.splitext(workbook_path)[0] + '.sync.json'
+    return os.path.join(folder, name), state_path
+
+
+def _plain(value):
+    """Convert a cell value to a JSON value that round-trips through a DataFrame"""
+    if value is None:
+        return None
+    if isinstance(value, (datetime.date, np.datetime64)):
+        value = pd.Timestamp(value)
+        if pd.isna(value):
+            return None
+        return value.date().isoformat() if value == value.normalize() else value.isoformat()
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        if np.isnan(value):
+            return None
+        return int(value) if float(value).is_integer() else float(value)
+    # Empty cells come back from Excel as missing values
+    return str(value) or None
+
+
+def _encode(payload):
+    return json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()
+
+
+def local_records(data):
+    """Return {key: (chunk hash, payload)} for every record in the budget tables"""
+    records = {}
+    for table in TABLES:
+        df = data[table]
+        columns = [column for column in df.columns if column != 'ID']
+        for record_id, row in zip(df['ID'], df[columns].itertuples(index=False, name=None)):
+            payload = {'table': table, 'values': {column: _plain(value) for column, value in zip(columns, row)}}
+            records[f"{table}/{record_id}"] = (hashlib.sha256(_encode(payload)).hexdigest(), payload)
+    return records
+
+
+def compare_clocks(a, b):
+    """Return 1 if clock a is newer, -1 if b is newer, 0 if equal, None if concurrent"""
+    a_newer = any(count > b.get(device, 0) for device, count in a.items())
+    b_newer = any(count > a.get(device, 0) for device, count in b.items())
+    if a_newer and b_newer:
+        return None
+    return 1 if a_newer else -1 if b_newer else 0
+
+
+def merge_clocks(a, b):
+    """Return the element-wise maximum of two vector clocks"""
+    return {device: max(a.get(device, 0), b.get(device, 0)) for device in set(a) | set(b)}
+
+
+def _wins(candidate, current):
+    # Deterministic pick between concurrent versions: the version with more
+    # edits behind it, then the larger content hash (deletions lose ties)
+    return (sum(candidate['clock'].values()), candidate['chunk'] or '') > \
+        (sum(current['clock'].values()), current['chunk'] or '')
+
+
+def _write_json(path, document):
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(document, f)
+    os.replace(temp_path, path)
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _read_change_sets(changes_dir, device, seen):
+    """Yield (peer, seq, records) for other devices' change-sets not yet seen"""
+    for peer in sorted(os.listdir(changes_dir)):
+        if peer == device:
+            continue
+        last_seen = seen.get(peer, 0)
+        names = sorted(name for name in os.listdir(os.path.join(changes_dir, peer)) if name.endswith('.json'))
+        for name in names:
+            seq = int(name.split('.')[0])
+            if seq > last_seen:
+                yield peer, seq, _read_json(os.path.join(changes_dir, peer, name))['records']
+
+
+def _adopt_peer_ids(data, changes_dir, chunks_dir, device, known):
+    """Give local category rows the IDs other devices published for the same category.
+
+    Every device starts from the same default categories but gives them new
+    random IDs, so without this a device's first sync would add its defaults
+    to every other device. Adopted rows start from the peer's clock, so a
+    local edit made before the first sync still counts as newer.
+    """
+    latest = {}
+    for _, _, records in _read_change_sets(changes_dir, device, {}):
+        for incoming in records:
+            current = latest.get(incoming['key'])
+            if current is None:
+                latest[incoming['key']] = incoming
+                continue
+            order = compare_clocks(incoming['clock'], current['clock'])
+            if order == 1 or (order is None and _wins(incoming, current)):
+                latest[incoming['key']] = incoming
+
+    peer_ids = {}
+    for key in latest:
+        table, record_id = key.split('/', 1)
+        peer_ids.setdefault(table, set()).add(record_id)
+
+    for key, entry in latest.items():
+        table, record_id = key.split('/', 1)
+        if table not in ('income', 'expenses') or entry['chunk'] is None:
+            continue
+        df = data[table]
+        if (df['ID'] == record_id).any():
+            continue
+        category = _read_json(os.path.join(chunks_dir, f"{entry['chunk']}.json"))['values'].get('Category')
+        # Rows already carrying a peer's ID are taken
+        matches = df.index[(df['Category'] == category) & ~df['ID'].isin(peer_ids[table])]
+        if len(matches) == 0:
+            continue
+        df = df.copy()
+        df.loc[matches[0], 'ID'] = record_id
+        data[table] = df
+        known[key] = {'clock': dict(entry['clock']), 'chunk': entry['chunk']}
+
+
+def load_state(state_path):
+    """Load a device's sync state, starting a new device if there is none"""
+    if os.path.exists(state_path):
+        return _read_json(state_path)
+    return {'device': uuid.uuid4().hex, 'seq': 0, 'seen': {}, 'records': {}}
+
+
+def sync(data, shared_dir, state_path):
+    """Exchange changes with the other devices using ``shared_dir``.
+
+    Local changes since the last sync are published, then other devices'
+    change-sets are merged into ``data`` in place. Returns a report with the
+    number of records sent and received and of conflicts resolved.
+
+    Raises SyncError if ``data`` shares no records with the ledger this
+    device synced last time, since publishing it would delete that ledger
+    on every other device.
+    """
+    state = load_state(state_path)
+    device = state['device']
+    known = state['records']
+    chunks_dir = os.path.join(shared_dir, 'chunks')
+    changes_dir = os.path.join(shared_dir, 'changes')
+    os.makedirs(chunks_dir, exist_ok=True)
+    os.makedirs(os.path.join(changes_dir, device), exist_ok=True)
+
+    if not known:
+        _adopt_peer_ids(data, changes_dir, chunks_dir, device, known)
+
+    # Publish what changed here since the last sync
+    current = local_records(data)
+    live = [key for key, entry in known.items() if entry['chunk'] is not None]
+    if live and current and not any(key in current for key in live):
+        raise SyncError(
+            f"This budget is not the one last synced from {state_path}; "
+            "load that workbook before syncing"
+        )
+    outgoing = []
+    for key, (chunk, payload) in current.items():
+        entry = known.get(key)
+        if entry is not None and entry['chunk'] == chunk:
+            continue
+        clock = dict(entry['clock']) if entry else {}
+        clock[device] = clock.get(device, 0) + 1
+        known[key] = {'clock': clock, 'chunk': chunk}
+        outgoing.append(dict(known[key], key=key))
+        chunk_path = os.path.join(chunks_dir, f"{chunk}.json")
+        if not os.path.exists(chunk_path):
+            _write_json(chunk_path, payload)
+    for key, entry in known.items():
+        if entry['chunk'] is not None and key not in current:
+            clock = dict(entry['clock'])
+            clock[device] = clock.get(device, 0) + 1
+            known[key] = {'clock': clock, 'chunk': None}
+            outgoing.append(dict(known[key], key=key))
+    if outgoing:
+        state['seq'] += 1
+        _write_json(
+            os.path.join(changes_dir, device, f"{state['seq']:08d}.json"),
+            {'device': device, 'seq': state['seq'], 'records': outgoing},
+        )
+
+    # Merge what other devices published since we last looked
+    received = 0
+    conflicts = 0
+    for peer, seq, records in list(_read_change_sets(changes_dir, device, state['seen'])):
+        for incoming in records:
+            key = incoming['key']
+            entry = known.get(key, {'clock': {}, 'chunk': None})
+            order = compare_clocks(incoming['clock'], entry['clock'])
+            if order is None:
+                if incoming['chunk'] != entry['chunk']:
+                    conflicts += 1
+                take = _wins(incoming, entry)
+            else:
+                take = order > 0
+            if take and incoming['chunk'] != entry['chunk']:
+                _apply_record(data, key, incoming['chunk'], chunks_dir)
+                received += 1
+            known[key] = {
+                'clock': merge_clocks(incoming['clock'], entry['clock']),
+                'chunk': incoming['chunk'] if take else entry['chunk'],
+            }
+        state['seen'][peer] = seq
+
+    _write_json(state_path, state)
+    return {'sent': len(outgoing), 'received': received, 'conflicts': conflicts}
+
+
+def _apply_record(data, key, chunk, chunks_dir):
+    table, record_id = key.split('/', 1)
+    exists = (data[table]['ID'] == record_id).any()
+    if chunk is None:
+        if exists:
+            apply_change(data, {'table': table, 'op': 'delete', 'id': record_id})
+        return
+    values = _read_json(os.path.join(chunks_dir, f"{chunk}.json"))['values']
+    if values.get('Date') is not None:
+        # Dates travel as ISO strings; the ledger holds date objects
+        date = pd.Timestamp(values['Date'])
+        values['Date'] = date.date() if date == date.normalize() else date.to_pydatetime()
+    if exists:
+        apply_change(data, {'table': table, 'op': 'update', 'id': record_id, 'values': values})
+    else:
+        apply_change(data, {'table': table, 'op': 'add', 'id': record_id, 'values': dict(values, ID=record_id)})
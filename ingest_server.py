@@ -0,0 +1,234 @@
+"""Local HTTP endpoint for capturing transactions without opening the app.
+
+POST a JSON transaction, or a list of them, to /transactions:
+
+    {"amount": 12.5, "category": "Groceries", "description": "Milk",
+     "type": "Expense", "date": "2024-03-01"}
+
+Only amount and category are required; type defaults to Expense and date to
+today. Requests are acknowledged as soon as they are queued. A single writer
+thread appends queued transactions to the inbox file in batches, and the app
+adds them to the ledger on its next rerun.
+
+The server listens on localhost only unless a token is set; binding to other
+interfaces without one is refused.
+"""
+import hmac
+import json
+import math
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ledger_store import FileLock
+
+INBOX_PATH = os.environ.get('BUDGET_INBOX', 'budget_inbox.jsonl')
+DEFAULT_PORT = int(os.environ.get('BUDGET_INGEST_PORT', '8502'))
+
+# Shared secret clients must send in the X-Budget-Token header; required
+# to listen beyond localhost
+TOKEN = os.environ.get('BUDGET_INGEST_TOKEN')
+DEFAULT_HOST = os.environ.get('BUDGET_INGEST_HOST', '0.0.0.0' if TOKEN else '127.0.0.1')
+
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+# Most transactions written per batch, and how long to wait to fill one
+BATCH_SIZE = 500
+BATCH_WAIT = 0.05
+
+# Largest request body accepted (bytes)
+MAX_BODY = 1024 * 1024
+
+
+def parse_transaction(item):
+    """Validate one posted transaction and return it in ledger form.
+
+    Raises ValueError describing the first problem found.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("each transaction must be a JSON object")
+    category = str(item.get('category') or '').strip()
+    if not category:
+        raise ValueError("category is required")
+    if isinstance(item.get('amount'), bool):
+        raise ValueError("amount must be a number")
+    try:
+        amount = float(item['amount'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("amount must be a number")
+    if not math.isfinite(amount):
+        raise ValueError("amount must be a finite number")
+    if not amount > 0:
+        raise ValueError("amount must be greater than 0")
+    trans_type = item.get('type') or 'Expense'
+    if trans_type not in ('Income', 'Expense'):
+        raise ValueError("type must be Income or Expense")
+    try:
+        day = date.fromisoformat(item['date']) if item.get('date') else date.today()
+    except (TypeError, ValueError):
+        raise ValueError("date must be YYYY-MM-DD")
+    return {
+        'Date': day.isoformat(),
+        'Category': category,
+        'Description': str(item.get('description') or ''),
+        'Amount': amount,
+        'Type': trans_type,
+    }
+
+
+def drain_inbox(save, path=INBOX_PATH):
+    """Pass the transactions waiting in the inbox to ``save``, then remove them.
+
+    ``save(transactions)`` returns the transactions it stored; only those
+    are removed, and the rest stay in the inbox for the next drain, as do
+    all of them if it raises. Transactions the writer appends meanwhile are
+    kept. Returns the transactions removed. Raises LockTimeout when another
+    session is draining the inbox.
+    """
+    try:
+        if os.path.getsize(path) == 0:
+            return []
+    except OSError:
+        return []
+    # Held across the save so two sessions never store the same transactions
+    with FileLock(path + '.drain.lock', timeout=0):
+        with FileLock(path + '.lock'):
+            with open(path, 'rb') as f:
+                content = f.read()
+        lines = content.splitlines(keepends=True)
+        transactions = []
+        for line in lines:
+            transaction = json.loads(line)
+            transaction['Date'] = datetime.strptime(transaction['Date'], '%Y-%m-%d').date()
+            transactions.append(transaction)
+        saved = save(transactions) if transactions else []
+        if not saved:
+            return []
+        stored = {id(transaction) for transaction in saved}
+        kept = b''.join(line for line, transaction in zip(lines, transactions) if id(transaction) not in stored)
+        with FileLock(path + '.lock'):
+            with open(path, 'r+b') as f:
+                f.seek(len(content))
+                appended = f.read()
+                f.seek(0)
+                f.write(kept + appended)
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+    return saved
+
+
+class InboxWriter(threading.Thread):
+    """Background thread appending queued transactions to the inbox in batches"""
+
+    def __init__(self, path=INBOX_PATH):
+        super().__init__(daemon=True)
+        self.path = path
+        self.queue = queue.Queue()
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + BATCH_WAIT
+            while len(batch) < BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.write(batch)
+
+    def write(self, batch):
+        lines = ''.join(json.dumps(transaction) + '\n' for transaction in batch)
+        with FileLock(self.path + '.lock'):
+            with open(self.path, 'a') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY each
+    # keep-alive request stalls on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.respond(200, {'status': 'ok', 'queued': self.server.writer.queue.qsize()})
+        else:
+            self.respond(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/transactions':
+            self.respond(404, {'error': 'not found'})
+            return
+        # Requests refused before their body is read leave it in the
+        # stream, so their connection cannot be reused
+        if TOKEN and not hmac.compare_digest(self.headers.get('X-Budget-Token', '').encode(), TOKEN.encode()):
+            self.close_connection = True
+            self.respond(401, {'error': 'invalid token'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self.respond(400, {'error': 'invalid Content-Length'})
+            return
+        if length > MAX_BODY:
+            self.close_connection = True
+            self.respond(413, {'error': 'request too large'})
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b'null')
+            items = body if isinstance(body, list) else [body]
+            transactions = [parse_transaction(item) for item in items]
+        except ValueError as e:
+            self.respond(400, {'error': str(e)})
+            return
+        for transaction in transactions:
+            self.server.writer.queue.put(transaction)
+        self.respond(202, {'queued': len(transactions)})
+
+    def respond(self, status, document):
+        body = json.dumps(document).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep the launcher console quiet; every request would be logged otherwise
+        pass
+
+
+def start_ingest_server(host=DEFAULT_HOST, port=DEFAULT_PORT, inbox_path=INBOX_PATH):
+    """Start the ingest endpoint and its inbox writer in background threads.
+
+    Raises ValueError when asked to listen beyond localhost without a token.
+    """
+    if host not in LOCAL_HOSTS and not TOKEN:
+        raise ValueError(f"Set BUDGET_INGEST_TOKEN to accept transactions on {host}")
+    server = ThreadingHTTPServer((host, port), IngestHandler)
+    server.daemon_threads = True
+    server.writer = InboxWriter(inbox_path)
+    server.writer.start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    server = start_ingest_server()
+    print(f"Accepting transactions on http://{DEFAULT_HOST}:{DEFAULT_PORT}/transactions")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,112 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Upper bound on the DataFrame memory held by the cache (bytes)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def content_hash(data):
+    """Return the SHA-256 hex digest of raw workbook bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def ledger_nbytes(ledger):
+    """Estimate the memory held by the DataFrames of a ledger"""
+    return int(sum(
+        value.memory_usage(index=True, deep=True).sum()
+        for value in ledger.values()
+        if isinstance(value, pd.DataFrame)
+    ))
+
+
+def checkout(ledger):
+    """Return a per-session view of a shared ledger.
+
+    With pandas copy-on-write enabled, DataFrames are shallow copies that
+    share memory with the cached frames until a session edits them; the
+    first write copies only the touched data. Without copy-on-write a
+    shallow copy would write through to the shared ledger, so DataFrames
+    are copied in full instead.
+    """
+    deep = pd.get_option('mode.copy_on_write') is not True
+    return {
+        key: value.copy(deep=deep) if isinstance(value, pd.DataFrame) else value
+        for key, value in ledger.items()
+    }
+
+
+class LedgerCache:
+    """Process-wide LRU cache of loaded ledgers keyed by file content hash.
+
+    Entries are evicted least recently used first once the cached DataFrames
+    exceed ``max_bytes``. Sessions loading the same workbook at the same time
+    wait for a single parse instead of each parsing it.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get_or_load(self, key, loader):
+        """Return a session view of the ledger for ``key``, loading it on a miss.
+
+        ``loader`` is called without arguments and must return a ledger dict
+        or None; None results are not cached.
+        """
+        ledger = self._get(key)
+        if ledger is not None:
+            return checkout(ledger)
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            # Another session may have finished loading while we waited
+            ledger = self._get(key)
+            if ledger is None:
+                ledger = loader()
+                if ledger is not None:
+                    self._put(key, ledger)
+        with self._lock:
+            self._key_locks.pop(key, None)
+
+        return checkout(ledger) if ledger is not None else None
+
+    def stats(self):
+        """Return the number of cached ledgers and the bytes they hold"""
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._total_bytes}
+
+    def clear(self):
+        """Drop every cached ledger"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _put(self, key, ledger):
+        nbytes = ledger_nbytes(ledger)
+        if nbytes > self.max_bytes:
+            # Too large to share; the caller still gets its own copy
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._entries[key] = (ledger, nbytes)
+            self._total_bytes += nbytes
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_bytes
@@ -0,0 +1,97 @@
+import sys
+from collections import deque
+from contextlib import contextmanager
+
+# Default bounds on the undo history
+DEFAULT_MAX_STEPS = 100
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+
+def change_size(change):
+    """Estimate the memory held by a change dict"""
+    size = sys.getsizeof(change) + sys.getsizeof(change['id'])
+    for value in change.get('values', {}).values():
+        size += sys.getsizeof(value)
+    return size
+
+
+class History:
+    """Undo/redo stack of record changes and their inverses.
+
+    Each step is the list of (change, inverse) pairs made by one user action,
+    so the history holds memory proportional to the edits rather than copies
+    of the ledger. Undoing applies the inverse changes, which takes as long
+    as making the edits did. The oldest steps are dropped once there are more than
+    ``max_steps`` or they hold more than ``max_bytes``.
+    """
+
+    def __init__(self, max_steps=DEFAULT_MAX_STEPS, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_steps = max_steps
+        self.max_bytes = max_bytes
+        self._undo = deque()
+        self._redo = deque()
+        self._bytes = 0
+        self._open_step = None
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    @contextmanager
+    def step(self):
+        """Group the changes recorded inside the block into one undo step"""
+        if self._open_step is not None:
+            yield
+            return
+        self._open_step = []
+        try:
+            yield
+        finally:
+            step, self._open_step = self._open_step, None
+            if step:
+                self._push(step)
+
+    def record(self, change, inverse):
+        """Record a change made by the user, discarding anything to redo"""
+        if inverse is None:
+            return
+        self._redo.clear()
+        if self._open_step is not None:
+            self._open_step.append((change, inverse))
+        else:
+            self._push([(change, inverse)])
+
+    def undo(self):
+        """Return the inverse changes undoing the last step, in order to apply"""
+        if not self._undo:
+            return []
+        step, size = self._undo.pop()
+        self._bytes -= size
+        self._redo.append(step)
+        return [inverse for _, inverse in reversed(step)]
+
+    def redo(self):
+        """Return the changes redoing the last undone step, in order to apply"""
+        if not self._redo:
+            return []
+        step = self._redo.pop()
+        self._push(step)
+        return [change for change, _ in step]
+
+    def clear(self):
+        """Forget all steps, e.g. after loading different data"""
+        self._undo.clear()
+        self._redo.clear()
+        self._bytes = 0
+
+    def _push(self, step):
+        size = sum(change_size(change) + change_size(inverse) for change, inverse in step)
+        self._undo.append((step, size))
+        self._bytes += size
+        while len(self._undo) > self.max_steps or (self._bytes > self.max_bytes and len(self._undo) > 1):
+            _, dropped = self._undo.popleft()
+            self._bytes -= dropped
@@ -0,0 +1,280 @@
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from ledger_cache import checkout
+
+# Budget tables whose rows are tracked as individual records
+TABLES = ('income', 'expenses', 'transactions')
+
+# Number of committed batches kept for propagating changes to other sessions
+MAX_LOG_ENTRIES = 1000
+
+
+def new_record_id():
+    """Return a new unique record ID"""
+    return uuid.uuid4().hex
+
+
+def ensure_ids(data):
+    """Give every row of the budget tables an ID, keeping existing ones"""
+    for table in TABLES:
+        df = data[table]
+        if 'ID' not in df.columns:
+            df = df.assign(ID=[new_record_id() for _ in range(len(df))])
+        elif df['ID'].isna().any():
+            df = df.copy()
+            missing = df['ID'].isna()
+            df.loc[missing, 'ID'] = [new_record_id() for _ in range(missing.sum())]
+        data[table] = df
+    return data
+
+
+def apply_change(data, change):
+    """Apply a single record change to a budget data dict in place.
+
+    A change is a dict with ``table``, ``op`` ('add', 'update' or 'delete'),
+    ``id`` and, for adds and updates, the column ``values`` to write. Adds
+    may give the row ``position`` to insert at; by default they append.
+    Returns False when the record to update or delete no longer exists.
+
+    Finding the record scans the ``ID`` column, and adds and deletes build a
+    new DataFrame, so each change takes time proportional to the table size.
+    """
+    table = change['table']
+    df = data[table]
+    if change['op'] == 'add':
+        row = pd.DataFrame([change['values']])
+        position = change.get('position')
+        if position is None or position >= len(df):
+            data[table] = pd.concat([df, row], ignore_index=True)
+        else:
+            data[table] = pd.concat([df.iloc[:position], row, df.iloc[position:]], ignore_index=True)
+        return True
+
+    mask = df['ID'] == change['id']
+    if not mask.any():
+        return False
+    if change['op'] == 'update':
+        for column, value in change['values'].items():
+            df.loc[mask, column] = value
+    else:
+        data[table] = df[~mask].reset_index(drop=True)
+    return True
+
+
+def inverse_change(data, change):
+    """Return the change that undoes ``change``, or None if it would do nothing.
+
+    Must be called before ``change`` is applied. Updates are undone by
+    restoring only the columns they touch; deletes keep the removed row and
+    its position so it comes back where it was.
+    """
+    if change['op'] == 'add':
+        return {'table': change['table'], 'op': 'delete', 'id': change['id']}
+
+    df = data[change['table']]
+    matches = (df['ID'] == change['id']).to_numpy().nonzero()[0]
+    if len(matches) == 0:
+        return None
+    position = int(matches[0])
+    if change['op'] == 'update':
+        old_values = {column: df[column].iloc[position] for column in change['values'] if column in df.columns}
+        return {'table': change['table'], 'op': 'update', 'id': change['id'], 'values': old_values}
+    return {
+        'table': change['table'],
+        'op': 'add',
+        'id': change['id'],
+        'values': df.iloc[position].to_dict(),
+        'position': position,
+    }
+
+
+class LockTimeout(Exception):
+    """Raised when a file lock cannot be acquired in time"""
+
+
+class FileLock:
+    """Cross-process lock held by exclusively creating a lock file.
+
+    Lock files older than ``stale_after`` seconds are assumed to belong to a
+    crashed process and are removed.
+    """
+
+    def __init__(self, path, timeout=10.0, stale_after=60.0):
+        self.path = path
+        self.timeout = timeout
+        self.stale_after = stale_after
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > self.stale_after:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise LockTimeout(f"Timed out waiting for {self.path}")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class LedgerStore:
+    """Shared, versioned copy of one budget workbook.
+
+    Sessions commit batches of record changes with the record version they
+    last saw (optimistic concurrency). Changes made against an outdated
+    version are rejected as conflicts; the rest are applied and logged so
+    other sessions can pick them up without reloading the workbook.
+    """
+
+    def __init__(self, file_path, data):
+        self.file_path = file_path
+        self.revision = 0
+        self._data = ensure_ids(checkout(data))
+        self._versions = {
+            table: {record_id: 1 for record_id in self._data[table]['ID']}
+            for table in TABLES
+        }
+        self._log = []
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def snapshot(self):
+        """Return the current revision, a copy of the data and record versions"""
+        with self._lock:
+            versions = {table: dict(self._versions[table]) for table in TABLES}
+            return self.revision, checkout(self._data), versions
+
+    def commit(self, changes, session_id=None):
+        """Apply a batch of changes, returning the new revision and any conflicts.
+
+        Each change carries the ``base_version`` of the record it was made
+        against (0 for new records). Changes sharing a ``group`` key, such as
+        a transaction and the category total it updates, are applied or
+        rejected together; a change without one is a group of its own.
+        Conflicting groups are skipped; the others are applied together as
+        one revision.
+        """
+        groups = {}
+        for change in changes:
+            groups.setdefault(change.get('group', id(change)), []).append(change)
+
+        with self._lock:
+            applied = []
+            conflicts = []
+            for group in groups.values():
+                # Check the whole group against the versions it would see
+                # before applying any of it
+                seen = {}
+                for change in group:
+                    key = (change['table'], change['id'])
+                    current = seen.get(key, self._versions[change['table']].get(change['id'], 0))
+                    if current != change.get('base_version', 0):
+                        break
+                    seen[key] = 0 if change['op'] == 'delete' else current + 1
+                else:
+                    for change in group:
+                        versions = self._versions[change['table']]
+                        apply_change(self._data, change)
+                        if change['op'] == 'delete':
+                            versions.pop(change['id'], None)
+                            version = 0
+                        else:
+                            version = versions.get(change['id'], 0) + 1
+                            versions[change['id']] = version
+                        applied.append(dict(change, version=version))
+                    continue
+                conflicts.extend(group)
+
+            if applied:
+                self.revision += 1
+                self._log.append((self.revision, session_id, applied))
+                del self._log[:-MAX_LOG_ENTRIES]
+                self._dirty = True
+            return self.revision, conflicts
+
+    def changes_since(self, revision, session_id=None):
+        """Return the revision and changes committed after ``revision``.
+
+        Changes committed by ``session_id`` itself are left out. Returns None
+        when the log no longer reaches back that far and the caller should
+        take a fresh snapshot instead.
+        """
+        with self._lock:
+            if revision == self.revision:
+                return self.revision, []
+            if not self._log or self._log[0][0] > revision + 1:
+                return None
+            changes = [
+                change
+                for logged_revision, author, batch in self._log
+                if logged_revision > revision and author != session_id
+                for change in batch
+            ]
+            return self.revision, changes
+
+    def flush(self, save):
+        """Write the ledger to its workbook if it changed since the last flush.
+
+        ``save(data, file_path)`` writes a budget data dict. The workbook is
+        written to a temporary file under a file lock and then moved into
+        place, so readers never see a partially written file.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return False
+                data = checkout(self._data)
+                self._dirty = False
+
+            root, ext = os.path.splitext(self.file_path)
+            temp_path = f"{root}.saving{ext}"
+            try:
+                with FileLock(self.file_path + '.lock'):
+                    save(data, temp_path)
+                    os.replace(temp_path, self.file_path)
+            except Exception:
+                with self._lock:
+                    self._dirty = True
+                raise
+            return True
+
+
+class StoreRegistry:
+    """Process-wide registry of shared ledger stores keyed by file path"""
+
+    def __init__(self):
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def open(self, file_path, load):
+        """Return the store for ``file_path``, creating it from ``load()`` if needed"""
+        with self._lock:
+            store = self._stores.get(file_path)
+            if store is None:
+                store = LedgerStore(file_path, load())
+                self._stores[file_path] = store
+            return store
+
+    def get(self, file_path):
+        """Return the store already open for ``file_path``, or None"""
+        with self._lock:
+            return self._stores.get(file_path)
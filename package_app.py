@@ -1,9 +1,198 @@
+import argparse
+import asyncio
+import json
 import os
+import runpy
+import socket
+import statistics
 import subprocess
 import sys
+import tempfile
+import threading
 import time
+import urllib.request
+from datetime import date, timedelta
 
-def create_executable():
+# Launches timed when reporting start-up time, after one untimed launch
+# that loads the bundle into the OS file cache
+STARTUP_RUNS = 3
+
+def free_port():
+    """Return a TCP port that is free on this machine"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for_server(port, timeout=120):
+    """Wait until the Streamlit server on port answers its health check"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Streamlit did not start on port {port}")
+            time.sleep(0.1)
+
+def run_session(port, timeout=120):
+    """Open the app the way a browser does and wait for the page to finish running"""
+    from tornado.websocket import websocket_connect
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    async def session():
+        ws = await websocket_connect(f"ws://127.0.0.1:{port}/_stcore/stream")
+        rerun = BackMsg()
+        rerun.rerun_script.query_string = ""
+        await ws.write_message(rerun.SerializeToString(), binary=True)
+        while True:
+            data = await ws.read_message()
+            if data is None:
+                raise ConnectionError("Streamlit closed the session")
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            element = msg.delta.new_element
+            if element.WhichOneof("type") == "exception":
+                raise RuntimeError(f"The app failed to run: {element.exception.message}")
+            if msg.WhichOneof("type") == "script_finished":
+                ws.close()
+                return
+
+    asyncio.run(asyncio.wait_for(session(), timeout))
+
+def run_traced(trace_path):
+    """Run the launcher once and write the modules and files it used to trace_path.
+
+    Runs in a subprocess started by trace_app(). The app's page is rendered
+    once with the sample transactions in the quick-capture inbox, and a
+    workbook is saved and loaded, so the charts and Excel code paths are
+    part of the trace.
+    """
+    opened = set()
+
+    def audit(event, args):
+        if event == "open" and isinstance(args[0], str):
+            opened.add(args[0])
+
+    sys.addaudithook(audit)
+
+    import budget_io
+    workbook = os.path.join(os.path.dirname(trace_path), "trace.xlsx")
+    budget_io.save_to_excel(budget_io.empty_budget("Trace"), workbook, skip_unchanged=False)
+    budget_io.load_from_excel(workbook)
+
+    def drive():
+        port = int(os.environ["STREAMLIT_SERVER_PORT"])
+        wait_for_server(port)
+        run_session(port)
+        with open(trace_path, "w") as f:
+            json.dump({"modules": sorted(sys.modules), "files": sorted(opened)}, f)
+        os._exit(0)
+
+    threading.Thread(target=drive, daemon=True).start()
+    sys.argv = ["app_launcher.py"]
+    runpy.run_path("app_launcher.py", run_name="__main__")
+
+def trace_app():
+    """Run the app in a subprocess and return the modules and files it used"""
+    with tempfile.TemporaryDirectory() as tmp:
+        trace_path = os.path.join(tmp, "trace.json")
+        inbox_path = os.path.join(tmp, "inbox.jsonl")
+        with open(inbox_path, "w") as f:
+            for day in range(1, 91):
+                f.write(json.dumps({
+                    "Date": (date(2024, 1, 1) + timedelta(days=day)).isoformat(),
+                    "Category": "Income" if day % 30 == 0 else ["Groceries", "Housing", "Transportation"][day % 3],
+                    "Description": "Sample",
+                    "Amount": 1000.0 if day % 30 == 0 else 20.0 + day % 7,
+                    "Type": "Income" if day % 30 == 0 else "Expense",
+                }) + "\n")
+        env = dict(
+            os.environ,
+            BUDGET_INBOX=inbox_path,
+            BUDGET_INGEST_PORT=str(free_port()),
+            BUDGET_NO_BROWSER="1",
+            STREAMLIT_SERVER_PORT=str(free_port()),
+        )
+        subprocess.run(
+            [sys.executable, "-c", f"import package_app; package_app.run_traced({trace_path!r})"],
+            env=env,
+            timeout=600,
+            check=True,
+        )
+        with open(trace_path) as f:
+            return json.load(f)
+
+def bundle_size(path):
+    """Return the total size in bytes of the files under path"""
+    # Links point at files that are already counted
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, dirs, files in os.walk(path)
+        for name in files
+        if not os.path.islink(os.path.join(root, name))
+    )
+
+def launch_time(executable):
+    """Return the seconds from launching the app until its page has rendered"""
+    port = free_port()
+    env = dict(
+        os.environ,
+        BUDGET_INGEST_PORT=str(free_port()),
+        BUDGET_NO_BROWSER="1",
+        STREAMLIT_SERVER_PORT=str(port),
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        process = subprocess.Popen([executable], cwd=tmp, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_server(port)
+            run_session(port)
+            return time.perf_counter() - start
+        finally:
+            process.terminate()
+            process.wait()
+
+def startup_time(executable, runs=STARTUP_RUNS):
+    """Return the median warm start-up time of the app in seconds.
+
+    The first launch only warms the file cache and is not timed, so builds
+    are compared on equal terms; a cold start after a reboot is slower.
+    """
+    launch_time(executable)
+    return statistics.median(launch_time(executable) for _ in range(runs))
+
+def report_bundle(dist_path):
+    """Print and return the size and warm start-up time of a built app"""
+    app_dir = os.path.abspath(os.path.join(dist_path, "BudgetApp"))
+    executable = os.path.join(app_dir, "BudgetApp.exe" if os.name == "nt" else "BudgetApp")
+    size = bundle_size(app_dir)
+    seconds = startup_time(executable)
+    print(f"{app_dir}: {size / 1024 ** 2:.1f} MB, ready in {seconds:.1f} s (warm start)")
+    return size, seconds
+
+def build(slim=False, dist_path="dist", work_path="build"):
+    """Run PyInstaller on the spec file, pruned to what the app uses if slim"""
+    env = dict(os.environ)
+    env.pop("BUDGET_SLIM_TRACE", None)
+    if slim:
+        print("Tracing which modules and files the app uses...")
+        trace = trace_app()
+        os.makedirs(work_path, exist_ok=True)
+        trace_path = os.path.abspath(os.path.join(work_path, "slim_trace.json"))
+        with open(trace_path, "w") as f:
+            json.dump(trace, f)
+        env["BUDGET_SLIM_TRACE"] = trace_path
+    print("Building executable with PyInstaller...")
+    subprocess.check_call(
+        [sys.executable, "-m", "PyInstaller", "budget_app.spec", "--noconfirm",
+         "--distpath", dist_path, "--workpath", work_path],
+        env=env,
+    )
+
+def create_executable(slim=False, compare=False):
     """Create a standalone executable for the budget app."""
     print("Starting packaging process...")
     
@@ -20,31 +209,31 @@ def create_executable():
     with open(wrapper_path, "w") as f:
         f.write("""
 import os
-import subprocess
 import sys
-import time
 import webbrowser
 from threading import Timer
+from ingest_server import start_ingest_server
 
 def open_browser():
     webbrowser.open("http://localhost:8501")
 
 if __name__ == "__main__":
-    # Start Streamlit in a separate process
-    streamlit_cmd = [sys.executable, "-m", "streamlit", "run", "app.py", "--server.headless=true"]
+    # Accept quick-capture transactions while the app is running
+    try:
+        start_ingest_server()
+    except (OSError, ValueError) as e:
+        print(f"Quick-capture endpoint not started: {e}")
     
     # Open browser after a short delay
-    Timer(2, open_browser).start()
-    
-    # Run Streamlit
-    process = subprocess.Popen(streamlit_cmd)
+    if not os.environ.get("BUDGET_NO_BROWSER"):
+        Timer(2, open_browser).start()
     
-    try:
-        # Keep the app running until user closes it
-        process.wait()
-    except KeyboardInterrupt:
-        process.terminate()
-        process.wait()
+    # Run Streamlit in this process. In the standalone app sys.executable is
+    # this launcher, so "python -m streamlit" would only start another launcher
+    from streamlit.web import cli as stcli
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    sys.argv = ["streamlit", "run", app_path, "--server.headless=true", "--global.developmentMode=false"]
+    sys.exit(stcli.main())
 """)
     
     # Create the spec file for PyInstaller
@@ -52,9 +241,51 @@ if __name__ == "__main__":
     with open(spec_path, "w") as f:
         f.write("""
 # -*- mode: python ; coding: utf-8 -*-
+import json
+import os
+import sys
+
+from PyInstaller.utils.hooks import collect_data_files, copy_metadata
 
 block_cipher = None
 
+# Modules app.py imports from next to itself
+APP_MODULES = [
+    'ledger_cache',
+    'ledger_store',
+    'ledger_history',
+    'budget_io',
+    'chart_data',
+    'anomalies',
+    'folder_sync',
+    'ingest_server',
+]
+
+# Set by "package_app.py --slim" to a trace of the modules and files the app used
+SLIM_TRACE = os.environ.get('BUDGET_SLIM_TRACE')
+
+# Packages whose direct submodules are left out of slim builds unless the app imported them
+PRUNED_PACKAGES = ['streamlit', 'plotly', 'plotly.graph_objs', 'plotly.validators', 'pyarrow']
+
+# Packages whose data files are left out of slim builds unless the app read them
+PRUNED_DATA = ['plotly', 'pyarrow']
+
+# Shared libraries only loaded by one optional module
+OPTIONAL_LIBRARIES = {
+    'arrow_flight': 'pyarrow._flight',
+    'arrow_python_flight': 'pyarrow._flight',
+    'arrow_substrait': 'pyarrow._substrait',
+    'gandiva': 'pyarrow.gandiva',
+}
+
+if SLIM_TRACE:
+    # Precompile the app's own modules into the archive
+    datas = []
+    hiddenimports = APP_MODULES
+else:
+    datas = [(f'{module}.py', '.') for module in APP_MODULES]
+    hiddenimports = []
+
 a = Analysis(
     ['app_launcher.py'],
     pathex=[],
@@ -62,16 +293,18 @@ a = Analysis(
     datas=[
         ('app.py', '.'),
         ('.streamlit', '.streamlit'),
-    ],
+    ] + datas + collect_data_files('streamlit') + copy_metadata('streamlit'),
     hiddenimports=[
         'streamlit',
+        # Imported by the code Streamlit adds to app.py when it runs it
+        'streamlit.runtime.scriptrunner.magic_funcs',
         'pandas',
         'numpy',
         'plotly',
         'openpyxl',
         'uuid',
         'datetime',
-    ],
+    ] + hiddenimports,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -82,6 +315,56 @@ a = Analysis(
     noarchive=False,
 )
 
+if SLIM_TRACE:
+    with open(SLIM_TRACE) as f:
+        trace = json.load(f)
+    used_modules = set(trace['modules'])
+    used_files = {os.path.normcase(os.path.realpath(path)) for path in trace['files']}
+    used_packages = {module.split('.')[0] for module in used_modules}
+    third_party = {
+        name.split('.')[0] for name, path, typecode in a.pure
+        if name.split('.')[0] not in sys.stdlib_module_names and not name.startswith(('pyi', '_pyi'))
+    }
+    unused_packages = third_party - used_packages
+
+    def is_used(module):
+        parts = module.split('.')
+        if parts[0] in unused_packages:
+            return False
+        for depth in range(1, len(parts)):
+            if '.'.join(parts[:depth]) in PRUNED_PACKAGES and '.'.join(parts[:depth + 1]) not in used_modules:
+                return False
+        return True
+
+    def is_used_binary(dest, typecode):
+        parts = os.path.normpath(dest).split(os.sep)
+        if typecode == 'EXTENSION' and parts[0] in third_party:
+            return is_used('.'.join(parts[:-1] + [parts[-1].split('.')[0]]))
+        return not any(
+            library in parts[-1] and not is_used(module)
+            for library, module in OPTIONAL_LIBRARIES.items()
+        )
+
+    def is_used_data(dest, source):
+        top = os.path.normpath(dest).split(os.sep)[0]
+        if top in unused_packages:
+            return False
+        return top not in PRUNED_DATA or os.path.normcase(os.path.realpath(source)) in used_files
+
+    a.pure = [entry for entry in a.pure if is_used(entry[0])]
+    a.binaries = [entry for entry in a.binaries if is_used_binary(entry[0], entry[2])]
+    a.datas = [entry for entry in a.datas if is_used_data(entry[0], entry[1])]
+
+    # Drop links to files that are no longer collected
+    collected = {os.path.normpath(entry[0]) for entry in a.binaries + a.datas if entry[2] != 'SYMLINK'}
+
+    def is_linked(entry):
+        target = os.path.normpath(os.path.join(os.path.dirname(entry[0]), entry[1]))
+        return entry[2] != 'SYMLINK' or target in collected
+
+    a.binaries = [entry for entry in a.binaries if is_linked(entry)]
+    a.datas = [entry for entry in a.datas if is_linked(entry)]
+
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
 exe = EXE(
@@ -93,7 +376,8 @@ exe = EXE(
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
+    # Compressed binaries have to be unpacked on every start
+    upx=not SLIM_TRACE,
     console=True,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -108,7 +392,7 @@ coll = COLLECT(
     a.zipfiles,
     a.datas,
     strip=False,
-    upx=True,
+    upx=not SLIM_TRACE,
     upx_exclude=[],
     name='BudgetApp',
 )
@@ -124,13 +408,29 @@ coll = COLLECT(
     except ImportError:
         print("Pathlib package not found, continuing with packaging...")
     
-    # Run PyInstaller
-    print("Building executable with PyInstaller...")
-    subprocess.check_call([sys.executable, "-m", "PyInstaller", "budget_app.spec", "--noconfirm"])
+    if compare:
+        # Build both ways side by side and report the difference
+        build(dist_path=os.path.join("dist", "full"), work_path=os.path.join("build", "full"))
+        build(slim=True, dist_path=os.path.join("dist", "slim"), work_path=os.path.join("build", "slim"))
+        full_size, full_time = report_bundle(os.path.join("dist", "full"))
+        slim_size, slim_time = report_bundle(os.path.join("dist", "slim"))
+        print(f"\nSlim build is {(full_size - slim_size) / 1024 ** 2:.1f} MB smaller "
+              f"and ready {full_time - slim_time:.1f} s sooner on a warm start.")
+        return
+    
+    build(slim=slim)
+    if slim:
+        report_bundle("dist")
     
     print("\nPackaging complete!")
     print("Your standalone app is available in the 'dist/BudgetApp' folder.")
     print("To run the app, double-click on 'BudgetApp.exe' in that folder.")
 
 if __name__ == "__main__":
-    create_executable()
+    parser = argparse.ArgumentParser(description="Package the budget app as a standalone executable.")
+    parser.add_argument("--slim", action="store_true",
+                        help="leave out modules and data files a traced run of the app never used, and skip UPX")
+    parser.add_argument("--compare", action="store_true",
+                        help="build both ways into dist/full and dist/slim and report size and warm start-up time")
+    args = parser.parse_args()
+    create_executable(slim=args.slim, compare=args.compare)
@@ -0,0 +1,27 @@
+import datetime
+
+import pandas as pd
+
+from anomalies import _prepare, find_spikes
+
+
+def daily_spending(amounts):
+    days = [datetime.date(2024, 3, 1) + datetime.timedelta(days=i) for i in range(len(amounts))]
+    return _prepare(pd.DataFrame({
+        'ID': [str(i) for i in range(len(amounts))],
+        'Date': days,
+        'Category': 'Coffee',
+        'Description': '',
+        'Amount': amounts,
+        'Type': 'Expense',
+    }))
+
+
+def test_spike_over_steady_baseline_is_flagged():
+    spikes = find_spikes(daily_spending([10.0] * 10 + [500.0]))
+    assert spikes['Amount'].tolist() == [500.0]
+
+
+def test_steady_spending_is_not_flagged():
+    assert find_spikes(daily_spending([10.0] * 11)).empty
+    assert find_spikes(daily_spending([10.0] * 10 + [11.0])).empty
@@ -0,0 +1,130 @@
+import datetime
+import os
+
+import openpyxl
+import pandas as pd
+
+import folder_sync
+from budget_io import save_to_excel
+from ledger_store import apply_change, ensure_ids, new_record_id
+
+
+def default_budget():
+    """Return the budget a new app session starts with"""
+    return ensure_ids({
+        'income': pd.DataFrame({'Category': ['Salary', 'Side Hustle', 'Other'], 'Amount': [0.0, 0.0, 0.0]}),
+        'expenses': pd.DataFrame({'Category': ['Housing', 'Groceries', 'Other'], 'Amount': [0.0, 0.0, 0.0]}),
+        'transactions': pd.DataFrame(columns=['Date', 'Category', 'Description', 'Amount', 'Type']),
+        'month': 'March 2024',
+    })
+
+
+class Device:
+    """A budget workbook in its own directory, synced through a shared folder"""
+
+    def __init__(self, root, shared):
+        os.makedirs(root)
+        self.data = default_budget()
+        self.shared_dir, self.state_path = folder_sync.sync_paths(
+            os.path.join(root, 'budget_March_2024.xlsx'), shared)
+
+    def sync(self):
+        return folder_sync.sync(self.data, self.shared_dir, self.state_path)
+
+    def row(self, table, record_id):
+        df = self.data[table]
+        return df[df['ID'] == record_id].iloc[0]
+
+
+def make_devices(tmp_path):
+    shared = str(tmp_path / 'shared')
+    return Device(str(tmp_path / 'a'), shared), Device(str(tmp_path / 'b'), shared)
+
+
+def add_transaction(device, amount):
+    record_id = new_record_id()
+    apply_change(device.data, {'table': 'transactions', 'op': 'add', 'id': record_id, 'values': {
+        'Date': datetime.date(2024, 3, 1), 'Category': 'Groceries', 'Description': 'Market',
+        'Amount': amount, 'Type': 'Expense', 'ID': record_id,
+    }})
+    return record_id
+
+
+def update(device, table, record_id, **values):
+    apply_change(device.data, {'table': table, 'op': 'update', 'id': record_id, 'values': values})
+
+
+def test_fresh_default_devices_do_not_duplicate_categories(tmp_path):
+    a, b = make_devices(tmp_path)
+    a.sync()
+    b.sync()
+    a.sync()
+    for device in (a, b):
+        assert device.data['income']['Category'].tolist() == ['Salary', 'Side Hustle', 'Other']
+        assert device.data['expenses']['Category'].tolist() == ['Housing', 'Groceries', 'Other']
+    assert set(a.data['income']['ID']) == set(b.data['income']['ID'])
+
+
+def test_edit_before_first_sync_is_kept(tmp_path):
+    a, b = make_devices(tmp_path)
+    a.sync()
+    salary = b.data['income']['ID'][0]
+    update(b, 'income', salary, Amount=4000.0)
+    b.sync()
+    a.sync()
+    salary = a.data['income']['ID'][0]
+    assert a.row('income', salary)['Amount'] == 4000.0
+    assert b.row('income', salary)['Amount'] == 4000.0
+
+
+def test_add_edit_delete_propagate(tmp_path):
+    a, b = make_devices(tmp_path)
+    a.sync()
+    b.sync()
+
+    record_id = add_transaction(a, 12.5)
+    assert a.sync()['sent'] == 1
+    assert b.sync()['received'] == 1
+    received = b.row('transactions', record_id)
+    assert received['Amount'] == 12.5
+    assert received['Date'] == datetime.date(2024, 3, 1)
+
+    update(b, 'transactions', record_id, Amount=20.0)
+    b.sync()
+    a.sync()
+    assert a.row('transactions', record_id)['Amount'] == 20.0
+
+    apply_change(a.data, {'table': 'transactions', 'op': 'delete', 'id': record_id})
+    a.sync()
+    b.sync()
+    assert not (b.data['transactions']['ID'] == record_id).any()
+
+
+def test_concurrent_edits_converge(tmp_path):
+    a, b = make_devices(tmp_path)
+    record_id = add_transaction(a, 10.0)
+    a.sync()
+    b.sync()
+
+    update(a, 'transactions', record_id, Amount=11.0)
+    update(b, 'transactions', record_id, Amount=12.0)
+    a.sync()
+    report = b.sync()
+    a.sync()
+
+    assert report['conflicts'] == 1
+    assert a.row('transactions', record_id)['Amount'] == b.row('transactions', record_id)['Amount']
+    for table in ('income', 'expenses', 'transactions'):
+        assert sorted(a.data[table]['ID']) == sorted(b.data[table]['ID'])
+
+
+def test_received_dates_are_saved_as_dates(tmp_path):
+    a, b = make_devices(tmp_path)
+    add_transaction(a, 12.5)
+    a.sync()
+    b.sync()
+
+    path = str(tmp_path / 'received.xlsx')
+    save_to_excel(b.data, path, skip_unchanged=False)
+    sheet = openpyxl.load_workbook(path)['Transactions']
+    assert sheet['A2'].is_date
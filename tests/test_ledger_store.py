@@ -0,0 +1,100 @@
+import pandas as pd
+
+import ledger_store
+from ledger_store import LedgerStore, ensure_ids
+
+
+def make_store():
+    data = ensure_ids({
+        'income': pd.DataFrame({'Category': ['Salary'], 'Amount': [100.0]}),
+        'expenses': pd.DataFrame({'Category': ['Groceries'], 'Amount': [0.0]}),
+        'transactions': pd.DataFrame(columns=['Date', 'Category', 'Description', 'Amount', 'Type']),
+        'month': 'March 2024',
+    })
+    return LedgerStore('budget_March_2024.xlsx', data)
+
+
+def record_id(store, table):
+    return store.snapshot()[1][table]['ID'][0]
+
+
+def update(store, table, amount, base_version, group=None):
+    change = {'table': table, 'op': 'update', 'id': record_id(store, table),
+              'values': {'Amount': amount}, 'base_version': base_version}
+    if group is not None:
+        change['group'] = group
+    return change
+
+
+def amount(store, table):
+    return store.snapshot()[1][table]['Amount'].tolist()
+
+
+def test_stale_base_version_is_rejected():
+    store = make_store()
+    store.commit([update(store, 'income', 200.0, base_version=1)], 'a')
+    stale = update(store, 'income', 300.0, base_version=1)
+    _, conflicts = store.commit([stale], 'b')
+    assert conflicts == [stale]
+    assert amount(store, 'income') == [200.0]
+    assert store.snapshot()[2]['income'][record_id(store, 'income')] == 2
+
+
+def test_group_is_rejected_as_a_whole():
+    store = make_store()
+    store.commit([update(store, 'expenses', 5.0, base_version=1)], 'a')
+    transaction = {'table': 'transactions', 'op': 'add', 'id': 't1', 'group': 'g', 'values': {
+        'Date': '2024-03-01', 'Category': 'Groceries', 'Description': '', 'Amount': 7.0, 'Type': 'Expense', 'ID': 't1',
+    }}
+    total = update(store, 'expenses', 7.0, base_version=1, group='g')
+    revision_before = store.revision
+    revision, conflicts = store.commit([transaction, total], 'b')
+    assert conflicts == [transaction, total]
+    assert revision == revision_before
+    assert store.snapshot()[1]['transactions'].empty
+    assert amount(store, 'expenses') == [5.0]
+
+
+def test_other_groups_in_a_batch_still_apply():
+    store = make_store()
+    store.commit([update(store, 'expenses', 5.0, base_version=1)], 'a')
+    stale = update(store, 'expenses', 7.0, base_version=1, group='stale')
+    fresh = update(store, 'income', 150.0, base_version=1, group='fresh')
+    _, conflicts = store.commit([stale, fresh], 'b')
+    assert conflicts == [stale]
+    assert amount(store, 'income') == [150.0]
+
+
+def test_delete_then_add_in_one_batch():
+    store = make_store()
+    salary = record_id(store, 'income')
+    delete = {'table': 'income', 'op': 'delete', 'id': salary, 'base_version': 1}
+    add = {'table': 'income', 'op': 'add', 'id': salary, 'base_version': 0,
+           'values': {'Category': 'Salary', 'Amount': 250.0, 'ID': salary}}
+    _, conflicts = store.commit([delete, add], 'a')
+    assert conflicts == []
+    assert amount(store, 'income') == [250.0]
+    assert store.snapshot()[2]['income'][salary] == 1
+
+
+def test_changes_since_leaves_out_own_changes():
+    store = make_store()
+    start = store.revision
+    store.commit([update(store, 'income', 200.0, base_version=1)], 'a')
+    store.commit([update(store, 'expenses', 5.0, base_version=1)], 'b')
+    revision, changes = store.changes_since(start, 'a')
+    assert revision == store.revision
+    assert [change['table'] for change in changes] == ['expenses']
+    assert changes[0]['version'] == 2
+    assert store.changes_since(store.revision, 'a') == (store.revision, [])
+
+
+def test_changes_since_returns_none_once_log_is_truncated(monkeypatch):
+    monkeypatch.setattr(ledger_store, 'MAX_LOG_ENTRIES', 2)
+    store = make_store()
+    start = store.revision
+    for version in range(1, 4):
+        store.commit([update(store, 'income', 100.0 + version, base_version=version)], 'a')
+    assert store.changes_since(start, 'b') is None
+    revision, changes = store.changes_since(start + 1, 'b')
+    assert [change['values']['Amount'] for change in changes] == [102.0, 103.0]